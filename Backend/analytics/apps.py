@@ -1,6 +1,20 @@
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):
+        from . import invalidation  # noqa: F401 — подключает сигналы
+        from .snapshot import map_snapshot
+
+        # Файл снимка открывается при старте воркера: это mmap, без запросов к БД
+        try:
+            map_snapshot()
+        except (OSError, ValueError):
+            logger.exception("Snapshot file could not be mapped, falling back to the database")
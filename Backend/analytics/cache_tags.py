@@ -0,0 +1,108 @@
+"""Кэш с зависимостями: у каждого значения есть теги (модели, районы, клиники).
+
+У тега в Redis хранится версия. Значение сохраняется вместе с версиями своих
+тегов и считается устаревшим, как только любая из них изменилась, — так
+invalidate_tags «вытесняет» ровно зависящие от тега ключи, не перебирая их.
+"""
+import math
+import time
+
+from django.core.cache import cache
+
+# Теги, общие для всего проекта
+HOSPITALS = "hospitals"  # любая клиника — для значений по всему городу
+GRIDS = "grids"  # любая ячейка населения
+HIGH_DEMAND = "high-demand"  # таблица cached_high_demand_zones
+# Массовые загрузки без списка изменённых объектов сбрасывают эти теги вместо точечных
+HOSPITALS_BULK = "hospitals:bulk"
+GRIDS_BULK = "grids:bulk"
+
+
+def hospital_tag(name):
+    return f"hospital:{name}"
+
+
+def district_grids_tag(district_id):
+    return f"grids:district:{district_id}"
+
+
+# Клиники по участкам AREA_DEG × AREA_DEG (~11 × 8 км в Алматы): значения, зависящие
+# только от клиник поблизости, помечаются участками вокруг себя
+AREA_DEG = 0.1
+KM_PER_DEG_LAT = 111.32
+
+
+def _area(lon, lat):
+    return math.floor(lon / AREA_DEG), math.floor(lat / AREA_DEG)
+
+
+def hospital_area_tag(lon, lat):
+    """Тег участка, в котором лежит точка (клиника)."""
+    ix, iy = _area(lon, lat)
+    return f"hospitals:area:{ix}:{iy}"
+
+
+def hospital_area_tags_near(lon, lat, radius_km):
+    """Теги всех участков, пересекающих круг radius_km вокруг точки."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+    x0, y0 = _area(lon - dlon, lat - dlat)
+    x1, y1 = _area(lon + dlon, lat + dlat)
+    return [f"hospitals:area:{ix}:{iy}" for ix in range(x0, x1 + 1) for iy in range(y0, y1 + 1)]
+
+
+def _tag_key(tag):
+    return f"tag:{tag}"
+
+
+def _initial_version():
+    # Если Redis вытеснил версию, новая не должна совпасть ни с одной из старых
+    return time.time_ns()
+
+
+def tag_versions(tags, found=None):
+    """Текущие версии тегов (в том же порядке); found — уже прочитанные из кэша ключи."""
+    keys = [_tag_key(tag) for tag in tags]
+    if found is None:
+        found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), None)
+            version = cache.get(key)
+        versions.append(version)
+    return tuple(versions)
+
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def get_or_compute(key, tags, compute, timeout, extra=()):
+    """Значение, если версии его тегов не менялись с момента записи, иначе пересчитанное.
+
+    extra — дополнительные версии (например, снимков, из которых считается значение):
+    запись действительна, только пока совпадают и они.
+    """
+    found = cache.get_many([key, *(_tag_key(tag) for tag in tags)])
+    # Версии читаются до пересчёта: инвалидация во время compute() не потеряется
+    versions = tag_versions(tags, found) + tuple(extra)
+    entry = found.get(key)
+    if entry is not None and entry[0] == versions:
+        return entry[1]
+    return recompute(key, tags, compute, timeout, versions)
+
+
+def recompute(key, tags, compute, timeout, versions=None, extra=()):
+    """Пересчитывает и записывает значение, даже если оно ещё актуально (прогрев)."""
+    if versions is None:
+        versions = tag_versions(tags) + tuple(extra)
+    value = compute()
+    cache.set(key, (versions, value), timeout)
+    return value
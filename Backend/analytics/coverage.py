@@ -0,0 +1,108 @@
+"""Где открыть новые клиники: жадное максимальное покрытие населения.
+
+Спрос — население ячеек сетки дальше radius_km от всех существующих клиник,
+кандидаты на размещение — центроиды населённых ячеек. Матрица «кандидат ×
+непокрытая ячейка в радиусе» строится одним батч-запросом к KD-дереву и
+хранится разреженной (CSR). Дальше ленивый жадный алгоритм (CELF) на каждом
+шаге берёт кандидата с наибольшим приростом покрытого населения: прирост
+кандидата со временем только убывает, поэтому пересчитывать его нужно лишь
+для вершины кучи.
+"""
+import heapq
+
+import numpy as np
+from scipy import sparse
+
+from .snapshot import get_grid_snapshot, get_hospital_snapshot
+from .spatial import neighbour_matrix
+
+MAX_SITES = 50
+MAX_RADIUS_KM = 10.0
+
+
+def coverage_matrix(site_lon, site_lat, lon, lat, radius_km):
+    """Разреженная матрица (площадки × точки): True, если точка в radius_km от площадки."""
+    matrix = neighbour_matrix(site_lon, site_lat, lon, lat, radius_km)
+    return sparse.csr_matrix(
+        (np.ones(matrix.nnz, dtype=bool), matrix.indices, matrix.indptr), shape=matrix.shape
+    )
+
+
+def greedy_max_coverage(matrix, weights, n):
+    """До n строк matrix, жадно покрывающих наибольший суммарный вес столбцов.
+
+    Возвращает [(строка, прирост веса, число новых покрытых столбцов)] в порядке выбора.
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    gains = matrix.astype(np.int64) @ weights
+    heap = [(-int(gain), row) for row, gain in enumerate(gains) if gain > 0]
+    heapq.heapify(heap)
+
+    covered = np.zeros(len(weights), dtype=bool)
+    picks = []
+    while heap and len(picks) < n:
+        _, row = heapq.heappop(heap)
+        columns = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+        fresh = columns[~covered[columns]]
+        gain = int(weights[fresh].sum())
+        if gain <= 0:
+            continue
+        if heap and gain < -heap[0][0]:
+            # Прирост устарел и уже не лучший — вернуть в кучу с новым значением
+            heapq.heappush(heap, (-gain, row))
+            continue
+        covered[fresh] = True
+        picks.append((row, gain, len(fresh)))
+    return picks
+
+
+def plan_clinic_sites(radius_km, district_id=None, region=None, n=MAX_SITES):
+    """Площадки для n новых клиник, покрывающие больше всего людей вне radius_km от клиник.
+
+    Площадки выдаются в порядке выбора, поэтому первые k из плана на n — это
+    план на k: один расчёт отвечает на любое n.
+    """
+    grids = get_grid_snapshot()
+    if district_id is not None:
+        area = grids.district_mask(district_id)
+    elif region is not None:
+        area = grids.region_mask(region)
+    else:
+        area = np.ones(len(grids), dtype=bool)
+    positions = np.flatnonzero(area & (grids.population > 0))
+
+    distance_km, _ = get_hospital_snapshot().index.nearest(grids.cx[positions], grids.cy[positions])
+    demand = positions[distance_km > radius_km]
+    population = int(grids.population[positions].sum())
+    uncovered = int(grids.population[demand].sum())
+
+    matrix = coverage_matrix(
+        grids.cx[positions], grids.cy[positions], grids.cx[demand], grids.cy[demand], radius_km
+    )
+    picks = greedy_max_coverage(matrix, grids.population[demand], n)
+
+    sites = []
+    cumulative = 0
+    for rank, ((row, gain, cells), district) in enumerate(
+        zip(picks, grids.labels([positions[row] for row, _, _ in picks])), start=1
+    ):
+        i = positions[row]
+        cumulative += gain
+        sites.append({
+            "rank": rank,
+            "grid_id": int(grids.id[i]),
+            "x": float(grids.cx[i]),
+            "y": float(grids.cy[i]),
+            "district": district,
+            "covered_population": gain,
+            "covered_grids": cells,
+            "cumulative_covered_population": cumulative,
+        })
+
+    return {
+        "radius_km": radius_km,
+        "population": population,
+        "covered_population": population - uncovered,
+        "uncovered_population": uncovered,
+        "sites": sites,
+    }
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Func, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from clinics.models import Hospital
+from population.models import GridsPopulation
+
+
+def district_metrics(overload_threshold=None, critical_threshold=None):
+    """Население, число клиник, нагрузка и статус по районам — одним GROUP BY запросом.
+
+    status — "overloaded"/"normal" для дашборда, severity — подробная шкала
+    ("no clinics"/"critical"/"warning"/"normal") для выгрузок; пороги общие.
+    """
+    if overload_threshold is None:
+        overload_threshold = settings.DISTRICT_OVERLOAD_THRESHOLD
+    if critical_threshold is None:
+        critical_threshold = settings.DISTRICT_CRITICAL_THRESHOLD
+
+    # Район клиники и ячейки — по полигонам address_city_districts (assign_districts)
+    clinic_count = (
+        Hospital.objects
+        .filter(city_district=OuterRef("city_district"))
+        .order_by()
+        .annotate(count=Func(F("name"), function="COUNT"))
+        .values("count")
+    )
+
+    return (
+        GridsPopulation.objects
+        .filter(is_deleted=False, city_district__isnull=False)
+        .values("city_district", district=F("city_district__name_ru"))
+        .annotate(
+            population=Sum("total_sum_population"),
+            clinic_count=Coalesce(Subquery(clinic_count, output_field=IntegerField()), 0),
+        )
+        .annotate(
+            population_per_clinic=Case(
+                When(clinic_count__gt=0, then=Cast(
+                    Round(Cast("population", FloatField()) / F("clinic_count")), IntegerField()
+                )),
+                default=None,
+                output_field=IntegerField(),
+            ),
+        )
+        .annotate(
+            status=Case(
+                When(population_per_clinic__gt=overload_threshold, then=Value("overloaded")),
+                default=Value("normal"),
+            ),
+            severity=Case(
+                When(clinic_count=0, then=Value("no clinics")),
+                When(population_per_clinic__gt=critical_threshold, then=Value("critical")),
+                When(population_per_clinic__gt=overload_threshold, then=Value("warning")),
+                default=Value("normal"),
+            ),
+        )
+        .order_by("district")
+    )
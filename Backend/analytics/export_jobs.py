@@ -0,0 +1,123 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+
+from .exports import EXPORTS, FORMATS
+from .models import ExportJob
+
+export_storage = FileSystemStorage(location=settings.EXPORT_ROOT)
+
+
+def data_fingerprint(export, file_format):
+    raw = f"{export}:{file_format}:{EXPORTS[export].fingerprint()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _timed_out(job):
+    return job.created_at < timezone.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT)
+
+
+def submit_export_job(export, file_format):
+    """Ставит выгрузку в очередь; на неизменённых данных возвращает уже существующую задачу.
+
+    Возвращает (job, created).
+    """
+    from .tasks import run_export_job_task
+
+    fingerprint = data_fingerprint(export, file_format)
+    existing = (
+        ExportJob.objects
+        .filter(export=export, file_format=file_format, data_fingerprint=fingerprint)
+        .exclude(status=ExportJob.FAILED)
+        .order_by("-created_at")
+        .first()
+    )
+    if existing is not None and existing.status != ExportJob.DONE and _timed_out(existing):
+        # Задача потерялась (воркер упал, брокер потерял сообщение) — не ждать её вечно
+        existing.status = ExportJob.FAILED
+        existing.error = "timed out"
+        existing.finished_at = timezone.now()
+        existing.save(update_fields=["status", "error", "finished_at"])
+        existing = None
+    if existing is not None and (existing.status != ExportJob.DONE or export_storage.exists(existing.file)):
+        return existing, False
+
+    job = ExportJob.objects.create(export=export, file_format=file_format, data_fingerprint=fingerprint)
+    transaction.on_commit(lambda: run_export_job_task.delay(str(job.id)))
+    return job, True
+
+
+def run_export_job(job_id):
+    job = ExportJob.objects.get(id=job_id)
+    if job.status == ExportJob.DONE:
+        return job
+
+    job.status = ExportJob.RUNNING
+    job.save(update_fields=["status"])
+
+    _, writer = FORMATS[job.file_format]
+    digest = hashlib.sha256()
+    os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+    try:
+        with tempfile.NamedTemporaryFile(dir=settings.EXPORT_ROOT, suffix=".part") as tmp:
+            for chunk in writer(EXPORTS[job.export]):
+                digest.update(chunk)
+                tmp.write(chunk)
+            tmp.flush()
+
+            # Имя файла — хэш содержимого: одинаковые выгрузки хранятся один раз
+            name = f"{digest.hexdigest()}.{job.file_format}"
+            if not export_storage.exists(name):
+                tmp.seek(0)
+                name = export_storage.save(name, File(tmp))
+    except Exception as e:
+        job.status = ExportJob.FAILED
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        raise
+
+    job.status = ExportJob.DONE
+    job.content_hash = digest.hexdigest()
+    job.file = name
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "content_hash", "file", "finished_at"])
+    return job
+
+
+def cleanup_export_files(retention=None):
+    """Удаляет из EXPORT_ROOT файлы, заменённые более новыми выгрузками.
+
+    Остаются файлы последней готовой выгрузки каждого вида и формата, всех
+    выгрузок моложе retention секунд (их токены ещё могут скачивать) и любые
+    файлы моложе retention по mtime — в том числе ещё не отмеченные в ExportJob;
+    брошенные .part старше retention тоже удаляются. Возвращает список удалённых файлов.
+    """
+    retention = settings.EXPORT_RETENTION if retention is None else retention
+    if not os.path.isdir(settings.EXPORT_ROOT):
+        return []
+
+    done = ExportJob.objects.filter(status=ExportJob.DONE).exclude(file="")
+    keep = set(done.filter(finished_at__gte=timezone.now() - timedelta(seconds=retention)).values_list("file", flat=True))
+    for export, file_format in done.values_list("export", "file_format").distinct():
+        latest = done.filter(export=export, file_format=file_format).order_by("-finished_at").first()
+        keep.add(latest.file)
+
+    removed = []
+    cutoff = time.time() - retention
+    for entry in os.scandir(settings.EXPORT_ROOT):
+        if not entry.is_file() or entry.name in keep:
+            continue
+        if entry.stat().st_mtime > cutoff:
+            continue  # выгрузка ещё пишется или только что записана и не отмечена DONE
+        export_storage.delete(entry.name)
+        removed.append(entry.name)
+    return removed
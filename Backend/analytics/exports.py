@@ -0,0 +1,256 @@
+import csv
+import io
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from clinics.models import Hospital
+from population.models import GridsPopulation
+from .district_metrics import district_metrics
+from .models import CachedHighDemandZone
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+@dataclass
+class ExportSpec:
+    filename: str
+    # (заголовок, тип) — тип нужен для схемы Parquet: str, int, float, datetime
+    columns: list
+    rows: Callable  # () -> итератор кортежей в порядке columns
+    # () -> строка, которая меняется при изменении выгружаемых данных; дешевле самой выгрузки
+    fingerprint: Callable
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+
+def _rows_fingerprint(model, fields=None):
+    """md5 строк таблицы, посчитанный в БД; fields — только эти поля (по умолчанию вся строка)."""
+    qn = connection.ops.quote_name
+    if fields is None:
+        row = "t::text"
+    else:
+        columns = ", ".join(f"t.{qn(model._meta.get_field(name).column)}" for name in fields)
+        row = f"ROW({columns})::text"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT md5(string_agg(md5({row}), '' ORDER BY t.{qn(model._meta.pk.column)})) "
+            f"FROM {qn(model._meta.db_table)} AS t"
+        )
+        return cursor.fetchone()[0] or ""
+
+
+def _hospitals_fingerprint():
+    # У hospitals нет updated_at, поэтому хэшируем строки целиком прямо в БД
+    return _rows_fingerprint(Hospital)
+
+
+def _grids_fingerprint():
+    # updated_at не меняют ни assign_districts (сырой UPDATE), ни правки в обход save(),
+    # поэтому хэшируем поля, от которых зависят выгрузки; геометрию — нет, она тяжёлая
+    return _rows_fingerprint(GridsPopulation, [
+        "id", "is_deleted", "city_district", "name_region", "total_sum_population",
+        "f0_14", "f15_25", "f26_35", "f36_45", "f46_55", "f56_65", "f66",
+    ])
+
+
+def _district_stats_fingerprint():
+    return ":".join([
+        _grids_fingerprint(),
+        _hospitals_fingerprint(),
+        str(settings.DISTRICT_OVERLOAD_THRESHOLD),
+        str(settings.DISTRICT_CRITICAL_THRESHOLD),
+    ])
+
+
+def _high_demand_fingerprint():
+    stats = CachedHighDemandZone.objects.aggregate(count=Count("id"), updated=Max("updated_at"))
+    return f"{stats['count']}:{stats['updated']}"
+
+
+def _district_stats_rows():
+    # Районов мало — строки уже агрегированы в SQL
+    for row in district_metrics():
+        yield row["district"], row["population"], row["clinic_count"], row["population_per_clinic"], row["severity"]
+
+
+def _hospital_rows():
+    return (
+        Hospital.objects
+        .order_by("name")
+        .values_list("name", "district", "address", "city", "categories", "working_hours",
+                     "phone_1", "website_1", "instagram", "x", "y")
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+def _high_demand_rows():
+    return (
+        CachedHighDemandZone.objects
+        .order_by("-population")
+        .values_list("district", "x", "y", "population", "distance_km", "priority", "updated_at")
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+EXPORTS = {
+    "district-stats": ExportSpec(
+        filename="district_stats",
+        columns=[("Район", "str"), ("Население", "int"), ("Клиник", "int"),
+                 ("Чел. на 1 клинику", "int"), ("Статус", "str")],
+        rows=_district_stats_rows,
+        fingerprint=_district_stats_fingerprint,
+    ),
+    "hospitals": ExportSpec(
+        filename="hospitals_list",
+        columns=[("Название", "str"), ("Район", "str"), ("Адрес", "str"), ("Город", "str"),
+                 ("Категории", "str"), ("Часы работы", "str"), ("Телефон", "str"),
+                 ("Веб-сайт", "str"), ("Instagram", "str"), ("X", "float"), ("Y", "float")],
+        rows=_hospital_rows,
+        fingerprint=_hospitals_fingerprint,
+    ),
+    "high-demand": ExportSpec(
+        filename="high_demand_zones",
+        columns=[("Район", "str"), ("X", "float"), ("Y", "float"), ("Население", "int"),
+                 ("Расстояние до ближайшей клиники (км)", "float"), ("Приоритет", "str"),
+                 ("Обновлено", "datetime")],
+        rows=_high_demand_rows,
+        fingerprint=_high_demand_fingerprint,
+    ),
+}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(spec):
+    writer = csv.writer(_Echo())
+    # BOM, чтобы Excel открыл кириллицу в UTF-8
+    yield "\ufeff".encode("utf-8") + writer.writerow(spec.headers).encode("utf-8")
+    for row in spec.rows():
+        yield writer.writerow(row).encode("utf-8")
+
+
+def _excel_value(value):
+    # Excel не хранит таймзону
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def iter_xlsx(spec, chunk_size=64 * 1024):
+    # write_only пишет строки во временный XML, а не держит лист в памяти;
+    # zip-архив собирается при save, поэтому отдаём его уже после записи строк
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(spec.headers)
+    for row in spec.rows():
+        sheet.append([_excel_value(v) for v in row])
+
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(chunk_size):
+            yield chunk
+
+
+class _ChunkSink(io.RawIOBase):
+    """Поток только на запись: копит байты, которые генератор тут же отдаёт клиенту."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(spec, batch_size=None):
+    # pyarrow нужен только для этого формата
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "datetime": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(header, types[kind]) for header, kind in spec.columns])
+    batch_size = batch_size or settings.EXPORT_CHUNK_SIZE
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def flush(batch):
+        columns = list(zip(*batch))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+        ))
+        return sink.drain()
+
+    batch = []
+    for row in spec.rows():
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield flush(batch)
+            batch = []
+    if batch:
+        yield flush(batch)
+    writer.close()
+    yield sink.drain()
+
+
+FORMATS = {
+    "xlsx": (XLSX_CONTENT_TYPE, iter_xlsx),
+    "csv": ("text/csv; charset=utf-8", iter_csv),
+    "parquet": ("application/vnd.apache.parquet", iter_parquet),
+}
+
+
+async def aiter_chunks(chunks):
+    """Синхронный поток кусков как асинхронный: каждый next() — в потоке Django-вьюх.
+
+    Под ASGI Django читает синхронный итератор StreamingHttpResponse целиком в
+    память, асинхронный — отдаёт по кускам.
+    """
+    chunks = iter(chunks)
+    done = object()
+    while True:
+        chunk = await sync_to_async(next)(chunks, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def export_response(name, file_format, asynchronous=False):
+    """asynchronous — запрос обслуживается ASGI-сервером."""
+    spec = EXPORTS[name]
+    content_type, writer = FORMATS[file_format]
+    chunks = writer(spec)
+    response = StreamingHttpResponse(aiter_chunks(chunks) if asynchronous else chunks, content_type=content_type)
+    response["Content-Disposition"] = f"attachment; filename={spec.filename}.{file_format}"
+    return response
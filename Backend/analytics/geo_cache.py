@@ -0,0 +1,139 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.core.cache import cache
+from pyproj import Geod
+
+from .cache_tags import tag_versions
+
+GEOD = Geod(ellps="WGS84")
+
+
+def normalize_filter(value):
+    # Фильтры сравниваются через icontains, так что регистр и пробелы не важны
+    return " ".join(str(value).split()).casefold() if value else ""
+
+
+def geodesic_km(lon, lat, lons, lats):
+    """Расстояния (км) по эллипсоиду WGS84 от точки до массива точек — как geography в PostGIS."""
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    _, _, meters = GEOD.inv(np.full_like(lons, lon), np.full_like(lats, lat), lons, lats)
+    return np.asarray(meters) / 1000
+
+
+class LocalLRU:
+    """Небольшой LRU-кэш в памяти процесса с TTL; потокобезопасный."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class QuantizedCache:
+    """Кэш результатов, ключ которого — ячейка сетки precision_deg × precision_deg.
+
+    Все точки внутри ячейки делят одну запись, поэтому в ней хранится не готовый
+    ответ, а данные, из которых ответ точно пересчитывается для реальной точки.
+    """
+
+    def __init__(self, name, precision_deg, timeout, local_size=0):
+        self.name = name
+        self.precision_deg = precision_deg
+        self.timeout = timeout
+        # Необязательный первый уровень в памяти процесса перед Redis
+        self.local = LocalLRU(local_size, timeout) if local_size else None
+
+    def snap(self, lon, lat):
+        """Центр ячейки, в которую попадает точка."""
+        ix = math.floor(lon / self.precision_deg)
+        iy = math.floor(lat / self.precision_deg)
+        return (ix + 0.5) * self.precision_deg, (iy + 0.5) * self.precision_deg
+
+    def half_diagonal_km(self, lat):
+        # Дальше этого ни одна точка ячейки от её центра не отстоит
+        # (самый дальний угол — ближний к экватору)
+        half = self.precision_deg / 2
+        corner_lat = lat - half if lat >= 0 else lat + half
+        return float(geodesic_km(0.0, lat, [half], [corner_lat])[0])
+
+    def key(self, lon, lat, tags=(), **params):
+        # params должны быть уже нормализованы вызывающим кодом (см. normalize_filter);
+        # версии tags входят в ключ, так что после invalidate_tags старые записи не читаются
+        cell_lon, cell_lat = self.snap(lon, lat)
+        if tags:
+            params["versions"] = ",".join(map(str, tag_versions(tags)))
+        normalized = "|".join(f"{k}={'' if v is None else v}" for k, v in sorted(params.items()))
+        digest = hashlib.md5(normalized.encode("utf-8")).hexdigest()
+        return f"qcache:{self.name}:{self.precision_deg}:{cell_lon:.7f}:{cell_lat:.7f}:{digest}"
+
+    def get(self, key):
+        value = self.local.get(key) if self.local is not None else None
+        if value is None:
+            value = cache.get(key)
+            if value is not None and self.local is not None:
+                self.local.set(key, value)
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def set(self, key, value):
+        if self.local is not None:
+            self.local.set(key, value)
+        cache.set(key, value, self.timeout)
+
+    def get_or_set(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def _count(self, counter):
+        counter_key = f"qcache:{self.name}:{counter}"
+        cache.add(counter_key, 0, None)
+        try:
+            cache.incr(counter_key)
+        except ValueError:
+            # Счётчик вытеснили между add и incr
+            cache.set(counter_key, 1, None)
+
+    def stats(self):
+        counters = cache.get_many([f"qcache:{self.name}:hits", f"qcache:{self.name}:misses"])
+        hits = counters.get(f"qcache:{self.name}:hits", 0)
+        misses = counters.get(f"qcache:{self.name}:misses", 0)
+        total = hits + misses
+        return {
+            "precision_deg": self.precision_deg,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
@@ -0,0 +1,214 @@
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from population.models import GridsPopulation
+from .cache_tags import HIGH_DEMAND, invalidate_tags
+from .models import CachedHighDemandZone, HighDemandRefreshState
+from .snapshot import get_grid_snapshot, get_hospital_snapshot
+from .spatial import CentroidX, CentroidY, NearestClinicIndex
+
+THRESHOLD_POPULATION = 1500
+MIN_DISTANCE_KM = 1.0  # минимальное расстояние до ближайшей клиники в км
+
+
+def zone_priority(population):
+    return (
+        "critical" if population >= 5000 else
+        "high" if population >= 3000 else
+        "moderate"
+    )
+
+
+def _grids_from_db(grid_ids, threshold_population):
+    """Ячейки grid_ids прямо из БД: файл снимка может отставать от только что изменённых.
+
+    Те же столбцы, что в снимке: id, центроиды, население и подпись района.
+    """
+    rows = list(
+        GridsPopulation.objects
+        .filter(id__in=list(grid_ids), is_deleted=False, total_sum_population__gte=threshold_population)
+        .annotate(cx=CentroidX("geometry"), cy=CentroidY("geometry"))
+        .order_by("id")
+        .values_list("id", "cx", "cy", "total_sum_population", "city_district__name_ru", "name_region")
+    )
+    columns = list(zip(*rows)) if rows else [()] * 6
+    return (
+        np.asarray(columns[0], dtype=np.int64),
+        np.asarray(columns[1], dtype=np.float64),
+        np.asarray(columns[2], dtype=np.float64),
+        np.asarray(columns[3], dtype=np.int64),
+        [district if district is not None else region for district, region in zip(columns[4], columns[5])],
+    )
+
+
+def find_high_demand_zones(index=None, grid_ids=None,
+                           threshold_population=THRESHOLD_POPULATION,
+                           min_distance_km=MIN_DISTANCE_KM):
+    """Населённые ячейки сетки, до ближайшей клиники от которых дальше min_distance_km.
+
+    Центроиды и население берутся из колоночного снимка сетки, расстояние до
+    ближайшей клиники — одним батч-запросом к KD-дереву; grid_ids — ограничить
+    поиск этими ячейками, они читаются из БД.
+    """
+    if index is None:
+        index = get_hospital_snapshot().index
+
+    if grid_ids is None:
+        snapshot = get_grid_snapshot()
+        positions = np.flatnonzero(snapshot.population >= threshold_population)
+        ids, cx, cy = snapshot.id[positions], snapshot.cx[positions], snapshot.cy[positions]
+        population = snapshot.population[positions]
+    else:
+        ids, cx, cy, population, labels = _grids_from_db(grid_ids, threshold_population)
+    if not len(ids):
+        return []
+
+    distance_km, _ = index.nearest(cx, cy)
+    far = np.flatnonzero(distance_km > min_distance_km)
+    districts = snapshot.labels(positions[far]) if grid_ids is None else [labels[i] for i in far]
+
+    geometries = dict(
+        GridsPopulation.objects
+        .filter(id__in=ids[far].tolist())
+        .values_list("id", "geometry")
+    )
+
+    zones = []
+    for i, district in zip(far, districts):
+        grid_id = int(ids[i])
+        distance = distance_km[i]
+        zones.append({
+            "id": grid_id,
+            "x": float(cx[i]),
+            "y": float(cy[i]),
+            "population": int(population[i]),
+            "district": district,
+            "geometry": geometries.get(grid_id),
+            "priority": zone_priority(int(population[i])),
+            "distance_km": round(float(distance), 3) if np.isfinite(distance) else None,
+        })
+    return zones
+
+
+def _hospital_snapshot(index):
+    return {name: [float(x), float(y)] for name, x, y in zip(index.names, index.lon, index.lat)}
+
+
+def _changed_points(previous, current):
+    # Для добавленных, удалённых и перемещённых клиник — старые и новые координаты
+    points = []
+    for name in set(previous) | set(current):
+        old, new = previous.get(name), current.get(name)
+        if old != new:
+            points.extend(p for p in (old, new) if p is not None)
+    return points
+
+
+def _grids_near_changes(points, threshold_population, min_distance_km):
+    """Ячейки, чей статус или distance_km может измениться из-за изменившихся клиник."""
+    snapshot = get_grid_snapshot()
+    positions = np.flatnonzero(snapshot.population >= threshold_population)
+    if not len(positions) or not points:
+        return set()
+
+    ids = snapshot.id[positions].tolist()
+    changed = NearestClinicIndex([p[0] for p in points], [p[1] for p in points])
+    distance_km, _ = changed.nearest(snapshot.cx[positions], snapshot.cy[positions])
+
+    # Обычная ячейка затрагивается клиникой в пределах min_distance_km,
+    # зона — любой клиникой ближе её текущей ближайшей
+    stored = dict(CachedHighDemandZone.objects.values_list("grid_id", "distance_km"))
+    reach = np.array([
+        np.inf if stored.get(grid_id, 0) is None else max(min_distance_km, stored.get(grid_id, 0))
+        for grid_id in ids
+    ])
+    return {ids[i] for i in np.flatnonzero(distance_km <= reach)}
+
+
+def _store_zones(zones, affected_ids=None):
+    objects = [
+        CachedHighDemandZone(
+            grid_id=zone["id"],
+            x=zone["x"],
+            y=zone["y"],
+            population=zone["population"],
+            district=zone["district"],
+            priority=zone["priority"],
+            distance_km=zone["distance_km"],
+            geometry=zone["geometry"],
+        )
+        for zone in zones
+    ]
+    zone_ids = [zone["id"] for zone in zones]
+
+    stale = CachedHighDemandZone.objects.exclude(grid_id__in=zone_ids)
+    if affected_ids is not None:
+        stale = stale.filter(grid_id__in=affected_ids)
+    deleted, _ = stale.delete()
+
+    CachedHighDemandZone.objects.bulk_create(
+        objects,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["grid"],
+        update_fields=["x", "y", "population", "district", "priority", "distance_km", "geometry", "updated_at"],
+    )
+    return deleted
+
+
+def refresh_high_demand_zones(full=False,
+                              threshold_population=THRESHOLD_POPULATION,
+                              min_distance_km=MIN_DISTANCE_KM):
+    """Пересчитывает cached_high_demand_zones.
+
+    Без full пересчитываются только ячейки, изменившиеся с прошлого запуска,
+    и ячейки рядом с добавленными, удалёнными или перемещёнными клиниками.
+    """
+    started_at = timezone.now()
+    index = get_hospital_snapshot().index
+    hospitals = _hospital_snapshot(index)
+
+    state = HighDemandRefreshState.objects.order_by("-refreshed_at").first()
+    incremental = (
+        not full
+        and state is not None
+        and state.threshold_population == threshold_population
+        and state.min_distance_km == min_distance_km
+    )
+
+    if incremental:
+        affected_ids = set(
+            GridsPopulation.objects
+            .filter(updated_at__gt=state.refreshed_at)
+            .values_list("id", flat=True)
+        )
+        affected_ids |= _grids_near_changes(
+            _changed_points(state.hospitals, hospitals), threshold_population, min_distance_km
+        )
+    else:
+        affected_ids = None
+
+    zones = (
+        find_high_demand_zones(index, affected_ids, threshold_population, min_distance_km)
+        if affected_ids is None or affected_ids else []
+    )
+
+    with transaction.atomic():
+        deleted = _store_zones(zones, affected_ids)
+        HighDemandRefreshState.objects.all().delete()
+        HighDemandRefreshState.objects.create(
+            refreshed_at=started_at,
+            threshold_population=threshold_population,
+            min_distance_km=min_distance_km,
+            hospitals=hospitals,
+        )
+    if zones or deleted:
+        invalidate_tags(HIGH_DEMAND)
+
+    return {
+        "mode": "incremental" if incremental else "full",
+        "recomputed_grids": len(affected_ids) if affected_ids is not None else None,
+        "zones_upserted": len(zones),
+        "zones_deleted": deleted,
+    }
@@ -0,0 +1,115 @@
+"""Сброс кэшей при изменении клиник и ячеек населения.
+
+Сигналы ловят save/delete через ORM; массовые загрузки (bulk_create, update,
+сырой SQL) сигналов не шлют и должны сами вызвать hospitals_changed/grids_changed.
+Всё выполняется после коммита транзакции, в которой менялись данные.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from clinics.models import Hospital
+from geography.tiles import invalidate_tiles
+from population.models import GridsPopulation
+from .cache_tags import (
+    GRIDS, GRIDS_BULK, HOSPITALS, HOSPITALS_BULK, district_grids_tag, hospital_area_tag, hospital_tag,
+    invalidate_tags,
+)
+from .snapshot import cancel_snapshot_build, request_snapshot_build
+from .tasks import build_snapshot_task, refresh_high_demand_zones_task, warm_analytics_cache_task
+
+logger = logging.getLogger(__name__)
+
+
+def _delay(task, **kwargs):
+    # Данные уже закоммичены: недоступный брокер не должен превращать запись в 500,
+    # пропущенное догонит beat по расписанию
+    try:
+        task.delay(**kwargs)
+    except Exception:
+        logger.exception("Could not enqueue %s", task.name)
+        return False
+    return True
+
+
+def _refresh(only):
+    """Пересчёт зависящей от данных аналитики; only — префиксы ключей для прогрева."""
+    if settings.SNAPSHOT_PATH:
+        # Воркеры читают файл снимка, пока его не пересоберут: зоны и прогрев — после
+        # сборки; пока задача уже в очереди, новые записи только добавляют префиксы
+        if request_snapshot_build(only) and not _delay(build_snapshot_task):
+            cancel_snapshot_build()
+        return
+    # Зоны пересчитываются инкрементально — только рядом с изменёнными данными
+    _delay(refresh_high_demand_zones_task)
+    _delay(warm_analytics_cache_task, only=only)
+
+
+def hospitals_changed(names=None, points=None):
+    """Клиники names изменились; None — неизвестно какие (массовая загрузка).
+
+    points — их старые и новые координаты (lon, lat): кэш ближайших клиник
+    сбрасывается только на участках вокруг них, а не по всему городу.
+    """
+    if names is None:
+        tags = [HOSPITALS, HOSPITALS_BULK]
+    else:
+        tags = [HOSPITALS] + [hospital_tag(name) for name in names]
+        tags += sorted({hospital_area_tag(lon, lat) for lon, lat in points or ()})
+
+    def apply():
+        invalidate_tags(*tags)
+        _refresh(["district-stats", "clinic-summary", "accessibility"])
+
+    transaction.on_commit(apply)
+
+
+def grids_changed(district_ids=None):
+    """Ячейки в районах district_ids изменились; None — неизвестно какие (массовая загрузка)."""
+    if district_ids is None:
+        tags = [GRIDS, GRIDS_BULK]
+    else:
+        tags = [GRIDS] + [district_grids_tag(i) for i in set(district_ids) if i is not None]
+
+    def apply():
+        invalidate_tags(*tags)
+        invalidate_tiles("grids-population")
+        _refresh(["district-stats", "age-structure", "age-cube", "accessibility"])
+
+    transaction.on_commit(apply)
+
+
+@receiver(pre_save, sender=Hospital)
+def _remember_hospital_location(sender, instance, **kwargs):
+    # Клинику могли перенести — сбросить нужно и старый участок
+    instance._previous_location = (
+        Hospital.objects.filter(pk=instance.pk).values_list("x", "y").first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Hospital)
+@receiver(post_delete, sender=Hospital)
+def _hospital_changed(sender, instance, **kwargs):
+    locations = [(instance.x, instance.y), getattr(instance, "_previous_location", None)]
+    points = [p for p in locations if p is not None and None not in p]
+    hospitals_changed([instance.name], points)
+
+
+@receiver(pre_save, sender=GridsPopulation)
+def _remember_grid_district(sender, instance, **kwargs):
+    # Ячейка могла перейти в другой район — сбросить нужно оба
+    if instance.pk is None:
+        instance._previous_district_id = None
+        return
+    instance._previous_district_id = (
+        GridsPopulation.objects.filter(pk=instance.pk).values_list("city_district_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=GridsPopulation)
+@receiver(post_delete, sender=GridsPopulation)
+def _grid_changed(sender, instance, **kwargs):
+    grids_changed([instance.city_district_id, getattr(instance, "_previous_district_id", None)])
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Записывает снимок клиник и ячеек сетки в бинарный файл, который воркеры открывают через mmap"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=settings.SNAPSHOT_PATH, help="По умолчанию SNAPSHOT_PATH")
+
+    def handle(self, *args, **options):
+        if not options["path"]:
+            raise CommandError("Укажите --path или SNAPSHOT_PATH")
+        stats = build_snapshot(options["path"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['path']}: ячеек {stats['grids']}, клиник {stats['hospitals']}, рубрик {stats['categories']}"
+        ))
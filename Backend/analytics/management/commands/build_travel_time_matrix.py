@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from analytics.travel_times import build_travel_time_matrix
+
+
+class Command(BaseCommand):
+    help = "Строит матрицу времени в пути «ячейка сетки × N ближайших клиник» через OSRM table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nearest", type=int, default=5, help="Сколько ближайших клиник брать для каждой ячейки")
+        parser.add_argument("--chunk-size", type=int, default=25, help="Ячеек в одном запросе table")
+        parser.add_argument("--max-coordinates", type=int, default=100, help="Лимит точек в запросе (max-table-size OSRM)")
+        parser.add_argument("--workers", type=int, default=4, help="Параллельных запросов")
+
+    def handle(self, *args, **options):
+        stats = build_travel_time_matrix(
+            nearest=options["nearest"],
+            chunk_size=options["chunk_size"],
+            max_coordinates=options["max_coordinates"],
+            workers=options["workers"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Ячеек: {stats['grids']}, запросов: {stats['chunks']} (с ошибкой: {stats['failed_chunks']}), "
+            f"сохранено строк: {stats['rows']}"
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from analytics.high_demand import MIN_DISTANCE_KM, THRESHOLD_POPULATION, refresh_high_demand_zones
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает зоны высокого спроса и сохраняет их в cached_high_demand_zones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Пересчитать все ячейки, а не только изменившиеся")
+        parser.add_argument("--threshold-population", type=int, default=THRESHOLD_POPULATION)
+        parser.add_argument("--min-distance-km", type=float, default=MIN_DISTANCE_KM)
+
+    def handle(self, *args, **options):
+        stats = refresh_high_demand_zones(
+            full=options["full"],
+            threshold_population=options["threshold_population"],
+            min_distance_km=options["min_distance_km"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['mode']}: пересчитано ячеек {stats['recomputed_grids'] if stats['recomputed_grids'] is not None else 'все'}, "
+            f"сохранено зон {stats['zones_upserted']}, удалено {stats['zones_deleted']}"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytics.precompute import warm_analytics_cache
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает аналитику и записывает её в кэш под стабильными ключами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", nargs="+", help="Префиксы ключей, например district-stats age-structure")
+
+    def handle(self, *args, **options):
+        warmed = warm_analytics_cache(only=options["only"])
+        self.stdout.write(self.style.SUCCESS(f"Прогрето ключей: {len(warmed)}"))
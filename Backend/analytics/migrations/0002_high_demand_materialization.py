@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def clear_zones(apps, schema_editor):
+    # Таблица — производный кэш, её заново заполняет refresh_high_demand_zones
+    apps.get_model("analytics", "CachedHighDemandZone").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('population', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_zones, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='cachedhighdemandzone',
+            name='grid',
+            field=models.OneToOneField(default=None, on_delete=django.db.models.deletion.CASCADE, related_name='high_demand_zone', to='population.gridspopulation'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='cachedhighdemandzone',
+            name='distance_km',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cachedhighdemandzone',
+            index=models.Index(fields=['-population'], name='high_demand_population_idx'),
+        ),
+        migrations.CreateModel(
+            name='HighDemandRefreshState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refreshed_at', models.DateTimeField()),
+                ('threshold_population', models.IntegerField()),
+                ('min_distance_km', models.FloatField()),
+                ('hospitals', models.JSONField(default=dict)),
+            ],
+            options={
+                'db_table': 'high_demand_refresh_state',
+            },
+        ),
+    ]
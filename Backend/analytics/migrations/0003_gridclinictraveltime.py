@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_high_demand_materialization'),
+        ('clinics', '0002_hospital_location'),
+        ('population', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GridClinicTravelTime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('duration_s', models.FloatField(null=True)),
+                ('distance_m', models.FloatField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('grid', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='travel_times', to='population.gridspopulation')),
+                ('hospital', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='clinics.hospital')),
+            ],
+            options={
+                'db_table': 'grid_clinic_travel_times',
+                'indexes': [models.Index(fields=['grid', 'duration_s'], name='travel_time_grid_duration_idx')],
+                'constraints': [models.UniqueConstraint(fields=('grid', 'hospital'), name='travel_time_grid_hospital_uniq')],
+            },
+        ),
+    ]
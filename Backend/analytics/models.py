@@ -1,14 +1,81 @@
+import uuid
+
 from django.contrib.gis.db import models
 
+from clinics.models import Hospital
+from population.models import GridsPopulation
+
+
 class CachedHighDemandZone(models.Model):
+    grid = models.OneToOneField(GridsPopulation, on_delete=models.CASCADE, related_name="high_demand_zone")
     x = models.FloatField()
     y = models.FloatField()
     population = models.IntegerField()
     district = models.CharField(max_length=255)
     priority = models.CharField(max_length=20)
-    distance_km = models.FloatField()
+    distance_km = models.FloatField(null=True)
     geometry = models.GeometryField()
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "cached_high_demand_zones"
+        indexes = [
+            models.Index(fields=["-population"], name="high_demand_population_idx"),
+        ]
+
+
+class HighDemandRefreshState(models.Model):
+    # Снимок входных данных последнего пересчёта — по нему ищем изменения
+    refreshed_at = models.DateTimeField()
+    threshold_population = models.IntegerField()
+    min_distance_km = models.FloatField()
+    hospitals = models.JSONField(default=dict)  # name -> [x, y]
+
+    class Meta:
+        db_table = "high_demand_refresh_state"
+
+
+class GridClinicTravelTime(models.Model):
+    # Матрица «ячейка сетки × N ближайших клиник» по данным OSRM table
+    grid = models.ForeignKey(GridsPopulation, on_delete=models.CASCADE, related_name="travel_times")
+    # hospitals не управляется Django, поэтому без ограничения внешнего ключа в БД
+    hospital = models.ForeignKey(Hospital, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    rank = models.PositiveSmallIntegerField()  # порядок по расстоянию по прямой
+    duration_s = models.FloatField(null=True)  # None — маршрута нет
+    distance_m = models.FloatField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "grid_clinic_travel_times"
+        constraints = [
+            models.UniqueConstraint(fields=["grid", "hospital"], name="travel_time_grid_hospital_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["grid", "duration_s"], name="travel_time_grid_duration_idx"),
+        ]
+
+
+class ExportJob(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, PENDING), (RUNNING, RUNNING), (DONE, DONE), (FAILED, FAILED)]
+
+    # id служит и токеном для скачивания
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    export = models.CharField(max_length=50)  # ключ analytics.exports.EXPORTS
+    file_format = models.CharField(max_length=10)
+    data_fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    content_hash = models.CharField(max_length=64, blank=True)
+    file = models.CharField(max_length=255, blank=True)  # имя файла в EXPORT_ROOT
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "export_jobs"
+        indexes = [
+            models.Index(fields=["export", "file_format", "data_fingerprint"], name="export_job_dedup_idx"),
+        ]
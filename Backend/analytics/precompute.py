@@ -0,0 +1,382 @@
+"""Предрасчёт аналитики под стабильными ключами кэша.
+
+Результаты пересчитывает Celery beat (warm_analytics_cache_task) и сигналы
+изменения данных (analytics/invalidation.py), поэтому запросы пользователей
+читают готовые данные из Redis. Каждое значение помечено тегами своих
+зависимостей (cache_tags) и не переживает изменения этих данных.
+"""
+import hashlib
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.db.models import Count
+
+from clinics.models import Hospital
+from geography.districts import normalize_district_name, resolve_district
+from geography.models import AddressCityDistrict
+from . import accessibility as e2sfca
+from . import cache_tags
+from .cache_tags import GRIDS, GRIDS_BULK, HIGH_DEMAND, HOSPITALS, district_grids_tag
+from .coverage import plan_clinic_sites
+from .district_metrics import district_metrics
+from .high_demand import refresh_high_demand_zones
+from .models import CachedHighDemandZone, HighDemandRefreshState
+from .snapshot import AGE_BANDS, get_grid_snapshot, get_hospital_snapshot
+
+ALL_DISTRICTS = "Все районы"
+
+
+def cache_key(name):
+    return f"analytics:{name}"
+
+
+def snapshot_versions():
+    """Версии снимков, из которых сейчас считается аналитика.
+
+    С файлом снимка они отстают от тегов, пока build_snapshot_task не опубликует
+    новый файл: значения, посчитанные по старому файлу, хранятся с его версией и
+    пересчитываются, как только воркер откроет новый. Без файла версии снимков
+    совпадают с версиями тегов и не нужны.
+    """
+    if not settings.SNAPSHOT_PATH:
+        return ()
+    return get_grid_snapshot().version, get_hospital_snapshot().version
+
+
+def get_or_compute(name, tags, compute, snapshot=False):
+    """Значение из кэша; при промахе или изменении зависимостей считает и кладёт его.
+
+    snapshot — значение считается по снимкам, и их версии тоже входят в проверку.
+    """
+    extra = snapshot_versions() if snapshot else ()
+    return cache_tags.get_or_compute(cache_key(name), tags, compute, settings.ANALYTICS_CACHE_TIMEOUT, extra)
+
+
+def compute_district_stats():
+    return [
+        {
+            "district": row["district"],
+            "population": row["population"],
+            "clinic_count": row["clinic_count"],
+            "population_per_clinic": row["population_per_clinic"],
+            "status": row["status"],
+        }
+        for row in district_metrics()
+    ]
+
+
+def compute_age_structure(district_id=None, region=None):
+    snapshot = get_grid_snapshot()
+    if district_id is not None:
+        return snapshot.age_totals(snapshot.district_mask(district_id))
+    if region is not None:
+        return snapshot.age_totals(snapshot.region_mask(region))
+    return snapshot.age_totals()
+
+
+def compute_age_cube(per_grid=False):
+    """Куб район × возрастная группа по снимку сетки; per_grid — ещё и по ячейкам (столбцами)."""
+    snapshot = get_grid_snapshot()
+    cells = snapshot.sum_by_district(np.ones(len(snapshot), dtype=np.int64))
+    population = snapshot.sum_by_district(snapshot.population)
+    bands = snapshot.sum_by_district(snapshot.bands)
+
+    # Последняя строка сумм — ячейки вне районов
+    labels = snapshot.districts + [(None, None)]
+    districts = [
+        {
+            "id": district_id,
+            "district": name,
+            "population": int(population[code]),
+            **dict(zip(AGE_BANDS, (int(v) for v in bands[code]))),
+        }
+        for code, (district_id, name) in enumerate(labels)
+        if cells[code]
+    ]
+    districts.sort(key=lambda d: (d["district"] is None, d["district"] or ""))
+
+    cube = {
+        "bands": AGE_BANDS,
+        "districts": districts,
+        "total": {
+            "population": int(snapshot.population.sum()),
+            **snapshot.age_totals(),
+        },
+    }
+
+    if per_grid:
+        # Столбцы вместо списка объектов: ячеек много, так ответ в разы компактнее
+        district_ids = [d for d, _ in snapshot.districts]
+        cube["grids"] = {
+            "id": snapshot.id.tolist(),
+            "district_id": [district_ids[c] if c >= 0 else None for c in snapshot.district.tolist()],
+            "population": snapshot.population.tolist(),
+            **{band: snapshot.bands[:, j].tolist() for j, band in enumerate(AGE_BANDS)},
+        }
+    return cube
+
+
+_accessibility_lock = threading.Lock()
+_accessibility = {"versions": None, "result": None}
+
+
+def _accessibility_result():
+    """Расчёт E2SFCA, общий для трёх выдач: один на версии снимков grids и hospitals."""
+    grids, hospitals = get_grid_snapshot(), get_hospital_snapshot()
+    versions = (grids.version, hospitals.version)
+    with _accessibility_lock:
+        if _accessibility["versions"] != versions:
+            _accessibility["result"] = e2sfca.compute_accessibility(grids=grids, hospitals=hospitals)
+            _accessibility["versions"] = versions
+        return _accessibility["result"]
+
+
+def compute_accessibility_districts():
+    result = _accessibility_result()
+    access, population = result["accessibility"], result["grids"].population
+    total = int(population.sum())
+    return {
+        "catchment_km": e2sfca.CATCHMENT_KM,
+        "per_residents": e2sfca.PER_RESIDENTS,
+        "districts": e2sfca.district_rollup(result),
+        "total": {
+            "population": total,
+            "accessibility": round(float((access * population).sum() / total), 4) if total else None,
+            "no_access_population": int(population[access <= 0].sum()),
+        },
+    }
+
+
+def compute_accessibility_grids():
+    """Доступность по ячейкам столбцами — для хороплета поверх тайлов grids-population (по id)."""
+    result = _accessibility_result()
+    grids, access = result["grids"], result["accessibility"]
+    populated = access[grids.population > 0]
+    # Границы классов легенды — квинтили по населённым ячейкам
+    breaks = np.quantile(populated, [0.2, 0.4, 0.6, 0.8]).round(4).tolist() if len(populated) else []
+    return {
+        "catchment_km": e2sfca.CATCHMENT_KM,
+        "per_residents": e2sfca.PER_RESIDENTS,
+        "breaks": breaks,
+        "grids": {
+            "id": grids.id.tolist(),
+            "accessibility": access.round(4).tolist(),
+            "demand": result["demand"].round(1).tolist(),
+        },
+    }
+
+
+def compute_accessibility_clinics():
+    result = _accessibility_result()
+    return {
+        name: {"ratio": round(float(ratio), 4), "catchment_demand": round(float(demand), 1)}
+        for name, ratio, demand in zip(result["names"], result["ratio"], result["catchment_demand"])
+    }
+
+
+def compute_clinic_summary():
+    hospitals = Hospital.objects.filter(city_district__isnull=False)
+    total_clinics = hospitals.count()
+    clinics_by_district = list(
+        hospitals
+        .values("city_district__name_ru")
+        .annotate(count=Count("name"))
+        .order_by("-count")
+    )
+
+    districts_covered = len(clinics_by_district)
+    if clinics_by_district:
+        max_district = clinics_by_district[0]["city_district__name_ru"]
+        min_district = clinics_by_district[-1]["city_district__name_ru"]
+    else:
+        max_district = min_district = None
+
+    return {
+        "total_clinics": total_clinics,
+        "districts_covered": districts_covered,
+        "average_clinics_per_district": round(total_clinics / districts_covered, 2) if districts_covered else 0,
+        "max_clinic_district": max_district,
+        "min_clinic_district": min_district,
+    }
+
+
+def compute_high_demand_zones():
+    # Первый запуск без фоновой задачи — считаем синхронно
+    if not HighDemandRefreshState.objects.exists():
+        refresh_high_demand_zones()
+
+    zones = (
+        CachedHighDemandZone.objects
+        .annotate(geojson=AsGeoJSON("geometry"))
+        .order_by("-population")
+        .values("grid_id", "x", "y", "population", "district", "geojson", "priority", "distance_km")
+    )
+    return [
+        {
+            "id": z["grid_id"],
+            "x": z["x"],
+            "y": z["y"],
+            "population": z["population"],
+            "district": z["district"],
+            "geometry": z["geojson"],
+            "priority": z["priority"],
+            "distance_km": z["distance_km"],
+        }
+        for z in zones
+    ]
+
+
+def district_stats():
+    return get_or_compute("district-stats", [HOSPITALS, GRIDS], compute_district_stats)
+
+
+def _snapshot_region(name):
+    """name_region из снимка сетки, совпадающий с name после нормализации; None — такого нет."""
+    target = normalize_district_name(name)
+    return next((r for r in get_grid_snapshot().regions if normalize_district_name(r) == target), None)
+
+
+def _region_digest(region):
+    return hashlib.md5(region.encode("utf-8")).hexdigest()
+
+
+def age_structure(district=None):
+    if not district or district == ALL_DISTRICTS:
+        return get_or_compute("age-structure:all", [GRIDS], compute_age_structure, snapshot=True)
+
+    resolved = resolve_district(district)
+    if resolved is not None:
+        return get_or_compute(
+            f"age-structure:{resolved.id}",
+            [district_grids_tag(resolved.id), GRIDS_BULK],
+            lambda: compute_age_structure(district_id=resolved.id),
+            snapshot=True,
+        )
+
+    # Нераспознанный район: по name_region ячеек, ключ и фильтр — по одному и тому же
+    # названию из снимка; для неизвестных названий ничего не кэшируется
+    region = _snapshot_region(district)
+    if region is None:
+        return dict.fromkeys(AGE_BANDS, 0)
+    return get_or_compute(
+        f"age-structure:text:{_region_digest(region)}", [GRIDS], lambda: compute_age_structure(region=region),
+        snapshot=True,
+    )
+
+
+def age_cube(per_grid=False):
+    name = "age-cube:grids" if per_grid else "age-cube"
+    return get_or_compute(name, [GRIDS], lambda: compute_age_cube(per_grid), snapshot=True)
+
+
+def age_cube_etag(per_grid=False):
+    # Куб считается по снимку сетки — ETag по версии того снимка, что сейчас отдаётся
+    # (с файлом она отстаёт от тега grids до пересборки), без чтения самого куба
+    version = get_grid_snapshot().version
+    return hashlib.md5(f"{per_grid}:{version}".encode("utf-8")).hexdigest()
+
+
+def clinic_summary():
+    return get_or_compute("clinic-summary", [HOSPITALS], compute_clinic_summary)
+
+
+def high_demand_zones():
+    return get_or_compute("high-demand-zones", [HIGH_DEMAND], compute_high_demand_zones)
+
+
+def accessibility_districts():
+    return get_or_compute(
+        "accessibility:districts", [HOSPITALS, GRIDS], compute_accessibility_districts, snapshot=True
+    )
+
+
+def accessibility_grids():
+    return get_or_compute("accessibility:grids", [HOSPITALS, GRIDS], compute_accessibility_grids, snapshot=True)
+
+
+def accessibility_grids_etag():
+    # По версиям снимков, из которых считается E2SFCA, а не по тегам: с файлом они отстают
+    versions = (get_grid_snapshot().version, get_hospital_snapshot().version)
+    return hashlib.md5(f"accessibility:{versions}".encode("utf-8")).hexdigest()
+
+
+def accessibility_clinics():
+    return get_or_compute("accessibility:clinics", [HOSPITALS, GRIDS], compute_accessibility_clinics, snapshot=True)
+
+
+def coverage_plan(n, radius_km, district=None):
+    """План из n новых клиник; в кэше — полный план на MAX_SITES, n только обрезает его."""
+    name = f"coverage-plan:{radius_km:g}"
+    if not district or district == ALL_DISTRICTS:
+        plan = get_or_compute(f"{name}:all", [HOSPITALS, GRIDS], lambda: plan_clinic_sites(radius_km), snapshot=True)
+    else:
+        resolved = resolve_district(district)
+        if resolved is not None:
+            plan = get_or_compute(
+                f"{name}:{resolved.id}",
+                [HOSPITALS, district_grids_tag(resolved.id), GRIDS_BULK],
+                lambda: plan_clinic_sites(radius_km, district_id=resolved.id),
+                snapshot=True,
+            )
+        elif (region := _snapshot_region(district)) is not None:
+            # Ключ и фильтр — по одному и тому же name_region из снимка
+            plan = get_or_compute(
+                f"{name}:text:{_region_digest(region)}", [HOSPITALS, GRIDS],
+                lambda: plan_clinic_sites(radius_km, region=region),
+                snapshot=True,
+            )
+        else:
+            # Неизвестное название: пустой план, без записи в кэш
+            plan = {"radius_km": radius_km, "population": 0, "covered_population": 0,
+                    "uncovered_population": 0, "sites": []}
+
+    sites = plan["sites"][:n]
+    newly_covered = sites[-1]["cumulative_covered_population"] if sites else 0
+    return {
+        **plan,
+        "n": n,
+        "district": district or ALL_DISTRICTS,
+        "sites": sites,
+        "newly_covered_population": newly_covered,
+        "covered_population_after": plan["covered_population"] + newly_covered,
+    }
+
+
+def _precomputed():
+    """(ключ, теги, функция, считается ли по снимкам) для всего, что прогревается по расписанию."""
+    jobs = [
+        ("district-stats", [HOSPITALS, GRIDS], compute_district_stats, False),
+        ("clinic-summary", [HOSPITALS], compute_clinic_summary, False),
+        ("high-demand-zones", [HIGH_DEMAND], compute_high_demand_zones, False),
+        ("age-structure:all", [GRIDS], compute_age_structure, True),
+        ("age-cube", [GRIDS], compute_age_cube, True),
+        ("age-cube:grids", [GRIDS], lambda: compute_age_cube(per_grid=True), True),
+        ("accessibility:districts", [HOSPITALS, GRIDS], compute_accessibility_districts, True),
+        ("accessibility:grids", [HOSPITALS, GRIDS], compute_accessibility_grids, True),
+        ("accessibility:clinics", [HOSPITALS, GRIDS], compute_accessibility_clinics, True),
+    ]
+    for district_id in AddressCityDistrict.objects.values_list("id", flat=True):
+        jobs.append((
+            f"age-structure:{district_id}",
+            [district_grids_tag(district_id), GRIDS_BULK],
+            lambda district_id=district_id: compute_age_structure(district_id=district_id),
+            True,
+        ))
+    return jobs
+
+
+def warm_analytics_cache(only=None):
+    """Пересчитывает и перезаписывает предрасчитанные значения; only — префиксы ключей.
+
+    Старое значение остаётся в кэше до записи нового, так что холодного промаха нет.
+    """
+    warmed = []
+    for name, tags, compute, snapshot in _precomputed():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        extra = snapshot_versions() if snapshot else ()
+        cache_tags.recompute(cache_key(name), tags, compute, settings.ANALYTICS_CACHE_TIMEOUT, extra=extra)
+        warmed.append(name)
+    return warmed
@@ -0,0 +1,196 @@
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from config import http
+
+
+class RoutingError(Exception):
+    pass
+
+
+class RoutingUnavailable(RoutingError):
+    # Сервис маршрутов недоступен: таймаут, обрыв соединения или открыт предохранитель
+    pass
+
+
+class RouteNotFound(RoutingError):
+    pass
+
+
+class CircuitBreaker:
+    """После failure_threshold ошибок подряд перестаёт пускать запросы на reset_timeout секунд."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            # Полуоткрытое состояние: пропускаем один пробный запрос, остальные ждут его
+            # результата. Окно сдвигается, так что проба без результата (отменённый
+            # запрос) не держит предохранитель открытым дольше ещё одного reset_timeout
+            self._opened_at = now
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                # Неудачная проба снова открывает предохранитель на reset_timeout
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class BaseOSRMClient:
+    """Общая часть sync- и async-клиентов: URL, предохранитель и разбор ответов OSRM."""
+
+    ROUTE_PARAMS = {"overview": "full", "geometries": "geojson"}
+
+    def __init__(self, base_url, profile="driving", breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.profile = profile
+        self.breaker = breaker or CircuitBreaker(5, 30)
+
+    def _url(self, service, coordinates):
+        if not self.breaker.allow():
+            raise RoutingUnavailable("Routing service temporarily disabled")
+        coords = ";".join(f"{lon},{lat}" for lon, lat in coordinates)
+        return f"{self.base_url}/{service}/v1/{self.profile}/{coords}"
+
+    def _parse(self, res):
+        if res.status_code >= 500:
+            self.breaker.record_failure()
+            raise RoutingUnavailable(f"Routing service responded with {res.status_code}")
+        self.breaker.record_success()
+
+        try:
+            data = res.json()
+        except ValueError as e:
+            raise RoutingError("Invalid routing response") from e
+        if data.get("code") in ("NoRoute", "NoSegment"):
+            raise RouteNotFound(data.get("message", data["code"]))
+        if res.status_code != 200 or data.get("code") != "Ok":
+            raise RoutingError(data.get("message", f"Routing service responded with {res.status_code}"))
+        return data
+
+    @staticmethod
+    def _first_route(data):
+        if not data.get("routes"):
+            raise RouteNotFound("No route found")
+        return data["routes"][0]
+
+
+class OSRMClient(BaseOSRMClient):
+    """Клиент OSRM-совместимого сервиса маршрутов (публичный, свой или локальная заглушка)."""
+
+    def __init__(self, base_url, profile="driving", connect_timeout=2.0, read_timeout=5.0,
+                 pool_size=10, breaker=None):
+        super().__init__(base_url, profile, breaker)
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Keep-alive соединения переиспользуются между запросами воркера
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get(self, service, coordinates, params):
+        url = self._url(service, coordinates)
+        try:
+            res = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise RoutingUnavailable(str(e)) from e
+        return self._parse(res)
+
+    def route(self, origin, destination):
+        return self._first_route(self._get("route", [origin, destination], self.ROUTE_PARAMS))
+
+    def table(self, sources, destinations):
+        """Матрицы длительностей (с) и расстояний (м) sources × destinations; None — недостижимо."""
+        params = {
+            "sources": ";".join(str(i) for i in range(len(sources))),
+            "destinations": ";".join(str(len(sources) + i) for i in range(len(destinations))),
+            "annotations": "duration,distance",
+        }
+        data = self._get("table", list(sources) + list(destinations), params)
+        return data["durations"], data.get("distances")
+
+
+class AsyncOSRMClient(BaseOSRMClient):
+    """Клиент для async-вьюх: запросы идут через общий httpx.AsyncClient (config.http)."""
+
+    def __init__(self, base_url, profile="driving", connect_timeout=2.0, read_timeout=5.0, breaker=None):
+        super().__init__(base_url, profile, breaker)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+    async def _get(self, service, coordinates, params):
+        url = self._url(service, coordinates)
+        try:
+            res = await http.request("routing", "GET", url, params=params, timeout=self.timeout)
+        except httpx.HTTPError as e:
+            self.breaker.record_failure()
+            raise RoutingUnavailable(str(e)) from e
+        return self._parse(res)
+
+    async def route(self, origin, destination):
+        return self._first_route(await self._get("route", [origin, destination], self.ROUTE_PARAMS))
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_routing_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OSRMClient(
+                    settings.ROUTING_BASE_URL,
+                    profile=settings.ROUTING_PROFILE,
+                    connect_timeout=settings.ROUTING_CONNECT_TIMEOUT,
+                    read_timeout=settings.ROUTING_READ_TIMEOUT,
+                    pool_size=settings.ROUTING_POOL_SIZE,
+                    breaker=CircuitBreaker(settings.ROUTING_BREAKER_THRESHOLD, settings.ROUTING_BREAKER_RESET),
+                )
+    return _client
+
+
+def get_async_routing_client():
+    # Предохранитель общий с синхронным клиентом: сбои видны обоим
+    global _async_client
+    if _async_client is None:
+        breaker = get_routing_client().breaker
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncOSRMClient(
+                    settings.ROUTING_BASE_URL,
+                    profile=settings.ROUTING_PROFILE,
+                    connect_timeout=settings.ROUTING_CONNECT_TIMEOUT,
+                    read_timeout=settings.ROUTING_READ_TIMEOUT,
+                    breaker=breaker,
+                )
+    return _async_client
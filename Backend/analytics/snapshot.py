@@ -0,0 +1,426 @@
+"""Колоночные снимки grids_population и hospitals в памяти процесса.
+
+Аналитике нужны только центроиды, возрастные группы, население и район ячейки,
+а от клиник — координаты, рубрики и район. Снимки хранят их NumPy-массивами,
+так что агрегаты, пороги и поиск ближайших считаются векторно, без ORM.
+
+Если задан SNAPSHOT_PATH, воркеры открывают через mmap файл, который пишет
+manage.py build_snapshot (или build_snapshot_task после изменения данных): без
+запросов к БД при старте, страницы общие для всех процессов на машине. Новый
+файл подменяется атомарно, и воркеры переключаются на него без перезапуска;
+до этого они отдают прежний файл, даже если версия тега уже сменилась, — иначе
+каждый воркер после каждой записи шёл бы в БД сам. Значения, посчитанные по
+снимку, кэшируются вместе с его версией (precompute.snapshot_versions). Без файла снимок строится в
+процессе и актуален, пока не сменилась версия его тега (grids / hospitals, см.
+cache_tags).
+
+Формат файла: MAGIC, длина заголовка (uint64 LE), JSON-заголовок с версиями,
+словарями и описанием массивов (dtype, shape, offset), затем сами массивы,
+выровненные по ALIGN байт.
+"""
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+from functools import cached_property
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from clinics.categories import normalize_category, parse_categories
+from clinics.search import AutocompleteIndex
+from clinics.models import Hospital
+from geography.models import AddressCityDistrict
+from population.models import GridsPopulation
+from .cache_tags import GRIDS, HOSPITALS, tag_versions
+from .spatial import CentroidX, CentroidY, NearestClinicIndex
+
+logger = logging.getLogger(__name__)
+
+AGE_BANDS = ["f0_14", "f15_25", "f26_35", "f36_45", "f46_55", "f56_65", "f66"]
+
+MAGIC = b"ACSNAP01"
+ALIGN = 64
+
+
+def _districts():
+    return [tuple(d) for d in AddressCityDistrict.objects.order_by("id").values_list("id", "name_ru")]
+
+
+class GridSnapshot:
+    """Неудалённые ячейки сетки, упорядоченные по id.
+
+    district — индекс в districts (-1 — ячейка вне районов), region — индекс в regions.
+    """
+
+    ARRAYS = ["id", "cx", "cy", "population", "bands", "district", "region"]
+
+    def __init__(self, version, arrays, districts, regions):
+        self.version = version
+        self.id = arrays["id"]
+        self.cx = arrays["cx"]
+        self.cy = arrays["cy"]
+        self.population = arrays["population"]
+        self.bands = arrays["bands"]  # (n, len(AGE_BANDS))
+        self.district = arrays["district"]
+        self.region = arrays["region"]
+        self.districts = districts  # [(id, name_ru)]
+        self.regions = regions  # [name_region]
+        self._district_codes = {district_id: code for code, (district_id, _) in enumerate(districts)}
+        self._region_codes = {name: code for code, name in enumerate(regions)}
+
+    @classmethod
+    def from_db(cls, version):
+        districts = _districts()
+        codes = {district_id: code for code, (district_id, _) in enumerate(districts)}
+
+        rows = list(
+            GridsPopulation.objects
+            .filter(is_deleted=False)
+            .annotate(cx=CentroidX("geometry"), cy=CentroidY("geometry"))
+            .order_by("id")
+            .values_list("id", "cx", "cy", "total_sum_population", *AGE_BANDS, "city_district_id", "name_region")
+        )
+        columns = list(zip(*rows)) if rows else [()] * (6 + len(AGE_BANDS))
+        regions, region_codes = np.unique(np.asarray(columns[-1], dtype=object).astype(str), return_inverse=True)
+
+        arrays = {
+            "id": np.asarray(columns[0], dtype=np.int64),
+            "cx": np.asarray(columns[1], dtype=np.float64),
+            "cy": np.asarray(columns[2], dtype=np.float64),
+            "population": np.asarray(columns[3], dtype=np.int64),
+            "bands": np.asarray(columns[4:4 + len(AGE_BANDS)], dtype=np.int64).T.reshape(len(rows), len(AGE_BANDS)),
+            "district": np.asarray([codes.get(d, -1) for d in columns[-2]], dtype=np.int32),
+            "region": region_codes.astype(np.int32),
+        }
+        return cls(version, arrays, districts, [str(r) for r in regions])
+
+    def meta(self):
+        return {"version": self.version, "districts": self.districts, "regions": self.regions}
+
+    @classmethod
+    def from_meta(cls, meta, arrays):
+        return cls(meta["version"], arrays, [tuple(d) for d in meta["districts"]], meta["regions"])
+
+    def __len__(self):
+        return len(self.id)
+
+    def district_mask(self, district_id):
+        code = self._district_codes.get(district_id)
+        return self.district == code if code is not None else np.zeros(len(self), dtype=bool)
+
+    def region_mask(self, name):
+        code = self._region_codes.get(str(name))
+        return self.region == code if code is not None else np.zeros(len(self), dtype=bool)
+
+    def age_totals(self, mask=None):
+        bands = self.bands if mask is None else self.bands[mask]
+        return dict(zip(AGE_BANDS, (int(v) for v in bands.sum(axis=0))))
+
+    def sum_by_district(self, values, dtype=np.int64):
+        """Суммы values по районам: строка i — districts[i], последняя — ячейки вне районов."""
+        codes = np.where(self.district >= 0, self.district, len(self.districts))
+        values = np.asarray(values)
+        if values.ndim == 1:
+            return np.bincount(codes, weights=values, minlength=len(self.districts) + 1).astype(dtype)
+        return np.stack([
+            np.bincount(codes, weights=values[:, j], minlength=len(self.districts) + 1)
+            for j in range(values.shape[1])
+        ], axis=1).astype(dtype)
+
+    def labels(self, positions):
+        """Название района ячеек; для ячеек вне районов — name_region."""
+        return [
+            self.districts[self.district[i]][1] if self.district[i] >= 0 else self.regions[self.region[i]]
+            for i in positions
+        ]
+
+
+class HospitalSnapshot:
+    """Клиники, упорядоченные по названию; без координат — lon/lat NaN.
+
+    categories — битовая маска рубрик (n, words) uint64, бит j — рубрика category_names[j];
+    district — индекс в districts или -1.
+    """
+
+    ARRAYS = ["lon", "lat", "categories", "district"]
+
+    def __init__(self, version, arrays, names, category_names, districts):
+        self.version = version
+        self.lon = arrays["lon"]
+        self.lat = arrays["lat"]
+        self.categories = arrays["categories"]
+        self.district = arrays["district"]
+        self.names = names
+        self.category_names = category_names
+        self.districts = districts
+        self._category_codes = {name: code for code, name in enumerate(category_names)}
+
+    @classmethod
+    def from_db(cls, version):
+        districts = _districts()
+        codes = {district_id: code for code, (district_id, _) in enumerate(districts)}
+
+        rows = list(
+            Hospital.objects
+            .order_by("name")
+            .values_list("name", "x", "y", "categories", "city_district_id")
+        )
+        tags = [parse_categories(row[3]) for row in rows]
+        category_names = sorted({tag for row_tags in tags for tag in row_tags})
+        category_codes = {name: code for code, name in enumerate(category_names)}
+
+        words = max(1, -(-len(category_names) // 64))
+        bitmask = np.zeros((len(rows), words), dtype=np.uint64)
+        for i, row_tags in enumerate(tags):
+            for tag in row_tags:
+                code = category_codes[tag]
+                bitmask[i, code // 64] |= np.uint64(1) << np.uint64(code % 64)
+
+        arrays = {
+            "lon": np.asarray([np.nan if row[1] is None else row[1] for row in rows], dtype=np.float64),
+            "lat": np.asarray([np.nan if row[2] is None else row[2] for row in rows], dtype=np.float64),
+            "categories": bitmask,
+            "district": np.asarray([codes.get(row[4], -1) for row in rows], dtype=np.int32),
+        }
+        return cls(version, arrays, [row[0] for row in rows], category_names, districts)
+
+    def meta(self):
+        return {
+            "version": self.version,
+            "names": self.names,
+            "category_names": self.category_names,
+            "districts": self.districts,
+        }
+
+    @classmethod
+    def from_meta(cls, meta, arrays):
+        return cls(
+            meta["version"], arrays, meta["names"], meta["category_names"],
+            [tuple(d) for d in meta["districts"]],
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def matching_categories(self, query):
+        """Рубрики, равные query или содержащие его, — как прежний icontains, но по словарю рубрик."""
+        query = normalize_category(query)
+        if query in self._category_codes:
+            return [query]
+        return [name for name in self.category_names if query in name]
+
+    def category_mask(self, tags):
+        """Клиники хотя бы с одной из рубрик tags — AND битовых масок по всем клиникам сразу."""
+        query = np.zeros(self.categories.shape[1], dtype=np.uint64)
+        for tag in tags:
+            code = self._category_codes.get(tag)
+            if code is not None:
+                query[code // 64] |= np.uint64(1) << np.uint64(code % 64)
+        return (self.categories & query).any(axis=1)
+
+    def category_counts(self, mask=None):
+        """Число клиник по каждой рубрике; mask — учитывать только эти клиники."""
+        # Развёрнутые биты: столбец j — битовая карта «рубрика j -> клиники»
+        bitmaps = np.unpackbits(self.categories.astype("<u8", copy=False).view(np.uint8), axis=1, bitorder="little")
+        if mask is not None:
+            bitmaps = bitmaps[mask]
+        counts = bitmaps.sum(axis=0, dtype=np.int64)
+        return {name: int(counts[code]) for code, name in enumerate(self.category_names)}
+
+    def district_mask(self, district_id):
+        codes = [code for code, (d, _) in enumerate(self.districts) if d == district_id]
+        return self.district == codes[0] if codes else np.zeros(len(self), dtype=bool)
+
+    @cached_property
+    def autocomplete(self):
+        return AutocompleteIndex(self.names)
+
+    @cached_property
+    def index(self):
+        """KD-дерево по клиникам с координатами; строится один раз на версию."""
+        located = np.flatnonzero(np.isfinite(self.lon) & np.isfinite(self.lat))
+        return NearestClinicIndex(self.lon[located], self.lat[located], [self.names[i] for i in located])
+
+
+SECTIONS = {"grids": GridSnapshot, "hospitals": HospitalSnapshot}
+
+
+def _pad(offset):
+    return -offset % ALIGN
+
+
+def write_snapshot(path, grids, hospitals):
+    """Пишет снимки в один файл и атомарно подменяет им path."""
+    header = {"format": 1, "created_at": timezone.now().isoformat()}
+    payload = []
+    offset = 0
+    for section, snapshot in (("grids", grids), ("hospitals", hospitals)):
+        meta = snapshot.meta()
+        meta["arrays"] = {}
+        for name in snapshot.ARRAYS:
+            array = np.ascontiguousarray(getattr(snapshot, name))
+            meta["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            payload.append(array)
+            offset += array.nbytes + _pad(array.nbytes)
+        header[section] = meta
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    # Смещения в заголовке — от начала области данных, которая тоже выровнена
+    data_start = len(MAGIC) + 8 + len(header_bytes)
+    data_start += _pad(data_start)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * (data_start - f.tell()))
+            for array in payload:
+                f.write(array.tobytes())
+                f.write(b"\0" * _pad(array.nbytes))
+            f.flush()
+            os.fsync(f.fileno())
+        # Уже открытые mmap продолжают видеть старый файл, пока воркер не переключится
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def read_snapshot(path):
+    """{"grids": GridSnapshot, "hospitals": HospitalSnapshot} поверх mmap файла — без копирования."""
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a snapshot file")
+    (header_length,) = struct.unpack("<Q", bytes(buffer[len(MAGIC):len(MAGIC) + 8]))
+    header_end = len(MAGIC) + 8 + header_length
+    header = json.loads(bytes(buffer[len(MAGIC) + 8:header_end]).decode("utf-8"))
+    data_start = header_end + _pad(header_end)
+
+    snapshots = {}
+    for section, cls in SECTIONS.items():
+        meta = header[section]
+        arrays = {
+            name: np.ndarray(
+                tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=buffer, offset=data_start + spec["offset"]
+            )
+            for name, spec in meta["arrays"].items()
+        }
+        snapshots[section] = cls.from_meta(meta, arrays)
+    return snapshots
+
+
+def build_snapshot(path=None):
+    """Снимает актуальные данные из БД и записывает файл снимка (build_snapshot, Celery)."""
+    path = path or settings.SNAPSHOT_PATH
+    # Версии читаются до запросов: изменения во время сборки дадут более новую версию тега
+    grids_version, hospitals_version = (str(v) for v in tag_versions([GRIDS, HOSPITALS]))
+    grids = GridSnapshot.from_db(grids_version)
+    hospitals = HospitalSnapshot.from_db(hospitals_version)
+    write_snapshot(path, grids, hospitals)
+    return {"path": path, "grids": len(grids), "hospitals": len(hospitals), "categories": len(hospitals.category_names)}
+
+
+# Сборка файла после записей: одна задача в очереди и одна в работе, сколько бы
+# записей ни пришло; префиксы для прогрева копятся флагами до её запуска
+_BUILD_QUEUED = "snapshot:queued"
+_BUILD_RUNNING = "snapshot:building"
+WARM_PREFIXES = ["district-stats", "clinic-summary", "accessibility", "age-structure", "age-cube"]
+
+
+def _warm_key(prefix):
+    return f"snapshot:warm:{prefix}"
+
+
+def request_snapshot_build(only):
+    """Отмечает префиксы для прогрева; True, если задачу сборки нужно поставить в очередь."""
+    cache.set_many({_warm_key(prefix): 1 for prefix in only}, None)
+    return cache.add(_BUILD_QUEUED, 1, settings.SNAPSHOT_BUILD_TIMEOUT)
+
+
+def cancel_snapshot_build():
+    # Задачу не удалось поставить — следующая запись попробует снова
+    cache.delete(_BUILD_QUEUED)
+
+
+def start_snapshot_build():
+    """Захватывает сборку; False — другая ещё идёт. Снимает флаг очереди."""
+    if not cache.add(_BUILD_RUNNING, 1, settings.SNAPSHOT_BUILD_TIMEOUT):
+        return False
+    # Записи после этого момента поставят следующую сборку
+    cache.delete(_BUILD_QUEUED)
+    return True
+
+
+def finish_snapshot_build():
+    cache.delete(_BUILD_RUNNING)
+
+
+def take_snapshot_warm():
+    """Префиксы, отмеченные для прогрева с прошлой сборки; флаги снимаются."""
+    keys = {_warm_key(prefix): prefix for prefix in WARM_PREFIXES}
+    found = cache.get_many(list(keys))
+    cache.delete_many(list(found))
+    return [keys[key] for key in found]
+
+
+_lock = threading.Lock()
+_mapped = {"stat": None, "snapshots": {}}
+_loaded = {}
+
+
+def map_snapshot():
+    """Снимки из файла SNAPSHOT_PATH; файл переоткрывается, если его подменили."""
+    path = settings.SNAPSHOT_PATH
+    if not path:
+        return {}
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    key = (stat.st_ino, stat.st_mtime_ns)
+    if _mapped["stat"] != key:
+        with _lock:
+            if _mapped["stat"] != key:
+                _mapped["snapshots"] = read_snapshot(path)
+                _mapped["stat"] = key
+    return _mapped["snapshots"]
+
+
+def _get(section, tag):
+    # Файл отдаётся и отставшим от данных: свежий опубликует build_snapshot_task
+    try:
+        snapshot = map_snapshot().get(section)
+    except (OSError, ValueError):
+        logger.exception("Snapshot file could not be mapped, falling back to the database")
+        snapshot = None
+    if snapshot is not None:
+        return snapshot
+
+    # Файла нет — снимок текущей версии строится в процессе
+    version = str(tag_versions([tag])[0])
+    snapshot = _loaded.get(section)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        snapshot = _loaded.get(section)
+        if snapshot is None or snapshot.version != version:
+            snapshot = _loaded[section] = SECTIONS[section].from_db(version)
+        return snapshot
+
+
+def get_grid_snapshot():
+    return _get("grids", GRIDS)
+
+
+def get_hospital_snapshot():
+    return _get("hospitals", HOSPITALS)
@@ -0,0 +1,117 @@
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import Centroid
+from django.db.models import FloatField, Func, Value
+
+from clinics.models import Hospital
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class CentroidX(Func):
+    function = "ST_X"
+    output_field = FloatField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(Centroid(expression), **extra)
+
+
+class CentroidY(CentroidX):
+    function = "ST_Y"
+
+
+class KNNDistance(Func):
+    # Оператор <-> для ORDER BY: PostGIS обходит GiST-индекс в порядке близости
+    arg_joiner = " <-> "
+    template = "(%(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, point, **extra):
+        point = Value(point, output_field=PointField(geography=True, srid=4326))
+        super().__init__(expression, point, **extra)
+
+
+def to_unit_vectors(lon, lat):
+    # lon/lat (градусы) -> точки на единичной сфере, чтобы евклидово
+    # расстояние в дереве однозначно переводилось в расстояние по дуге
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    chord = np.clip(np.asarray(chord, dtype=np.float64), 0.0, 2.0)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(chord / 2)
+
+
+def km_to_chord(distance_km):
+    angle = np.minimum(np.asarray(distance_km, dtype=np.float64) / EARTH_RADIUS_KM, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+def neighbour_matrix(src_lon, src_lat, lon, lat, radius_km):
+    """Разреженная матрица расстояний (км) src × точки; хранятся только пары в радиусе radius_km.
+
+    Нулевые расстояния хранятся явно, так что структура матрицы — ровно пары соседей.
+    """
+    shape = (len(src_lon), len(lon))
+    if not shape[0] or not shape[1]:
+        return sparse.csr_matrix(shape, dtype=np.float64)
+
+    src, points = to_unit_vectors(src_lon, src_lat), to_unit_vectors(lon, lat)
+    neighbours = cKDTree(points).query_ball_point(src, km_to_chord(radius_km), workers=-1)
+    counts = np.fromiter((len(n) for n in neighbours), dtype=np.int64, count=shape[0])
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    indices = np.fromiter((j for n in neighbours for j in n), dtype=np.int64, count=int(indptr[-1]))
+    rows = np.repeat(np.arange(shape[0]), counts)
+    distance_km = chord_to_km(np.linalg.norm(src[rows] - points[indices], axis=1))
+    return sparse.csr_matrix((distance_km, indices, indptr), shape=shape)
+
+
+class NearestClinicIndex:
+    """KD-дерево по координатам клиник; расстояния — по большому кругу, в км."""
+
+    def __init__(self, lon, lat, names=None):
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.names = list(names) if names is not None else [None] * len(self.lon)
+        self.tree = cKDTree(to_unit_vectors(self.lon, self.lat)) if len(self.lon) else None
+
+    @classmethod
+    def from_hospitals(cls, queryset=None):
+        if queryset is None:
+            queryset = Hospital.objects.all()
+        rows = list(
+            queryset
+            .exclude(x__isnull=True)
+            .exclude(y__isnull=True)
+            .values_list("name", "x", "y")
+        )
+        names = [row[0] for row in rows]
+        lon = [row[1] for row in rows]
+        lat = [row[2] for row in rows]
+        return cls(lon, lat, names)
+
+    def __len__(self):
+        return len(self.lon)
+
+    def nearest(self, lon, lat, k=1):
+        """Расстояния (км) и индексы k ближайших клиник для массива точек."""
+        points = to_unit_vectors(lon, lat)
+        k = min(k, len(self)) if len(self) else k
+        if self.tree is None:
+            shape = (len(points),) if k == 1 else (len(points), k)
+            return np.full(shape, np.inf), np.full(shape, -1, dtype=np.int64)
+
+        chord, idx = self.tree.query(points, k=k)
+        return chord_to_km(chord), idx
+
+    def within(self, lon, lat, radius_km):
+        """Для каждой точки — индексы клиник в радиусе radius_km."""
+        points = to_unit_vectors(lon, lat)
+        if self.tree is None:
+            return [np.empty(0, dtype=np.int64) for _ in range(len(points))]
+        return [np.asarray(ids, dtype=np.int64) for ids in self.tree.query_ball_point(points, km_to_chord(radius_km))]
@@ -0,0 +1,53 @@
+from celery import shared_task
+
+from .export_jobs import cleanup_export_files, run_export_job
+from .high_demand import refresh_high_demand_zones
+from .precompute import warm_analytics_cache
+from .snapshot import (
+    build_snapshot, finish_snapshot_build, start_snapshot_build, take_snapshot_warm,
+)
+from .travel_times import build_travel_time_matrix
+
+
+@shared_task
+def refresh_high_demand_zones_task(full=False):
+    stats = refresh_high_demand_zones(full=full)
+    warm_analytics_cache(only=["high-demand-zones"])
+    return stats
+
+
+@shared_task
+def warm_analytics_cache_task(only=None):
+    return warm_analytics_cache(only=only)
+
+
+@shared_task
+def build_travel_time_matrix_task(nearest=5):
+    return build_travel_time_matrix(nearest=nearest)
+
+
+@shared_task
+def run_export_job_task(job_id):
+    run_export_job(job_id)
+
+
+@shared_task
+def cleanup_export_files_task():
+    return cleanup_export_files()
+
+
+@shared_task(bind=True, max_retries=None)
+def build_snapshot_task(self):
+    if not start_snapshot_build():
+        # Идёт другая сборка — эта запустится после неё и подхватит новые записи
+        raise self.retry(countdown=30)
+    try:
+        only = take_snapshot_warm()
+        stats = build_snapshot()
+        # Пока файл не подменён, воркеры читают прежний снимок, поэтому зоны и
+        # прогрев — только после публикации нового
+        refresh_high_demand_zones()
+        warm_analytics_cache(only=only + ["high-demand-zones"])
+    finally:
+        finish_snapshot_build()
+    return stats
@@ -0,0 +1,98 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from django.db import transaction
+
+from population.models import GridsPopulation
+from .models import GridClinicTravelTime
+from .routing import RoutingError, get_routing_client
+from .spatial import CentroidX, CentroidY, NearestClinicIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(grids, candidates, chunk_size, max_coordinates):
+    """Группирует соседние ячейки так, чтобы у запроса table было мало общих клиник.
+
+    В одном запросе не больше chunk_size ячеек и max_coordinates точек всего.
+    """
+    chunk, destinations = [], set()
+    for i in grids:
+        merged = destinations | set(candidates[i])
+        if chunk and (len(chunk) >= chunk_size or len(chunk) + 1 + len(merged) > max_coordinates):
+            yield chunk, sorted(destinations)
+            chunk, merged = [], set(candidates[i])
+        chunk.append(i)
+        destinations = merged
+    if chunk:
+        yield chunk, sorted(destinations)
+
+
+def build_travel_time_matrix(nearest=5, chunk_size=25, max_coordinates=100, workers=4, grids=None):
+    """Считает время и расстояние в пути от центроида ячейки до nearest ближайших клиник.
+
+    Кандидаты берутся из KD-дерева по прямой, затем уточняются сервисом OSRM
+    table пачками соседних ячеек в нескольких потоках.
+    """
+    index = NearestClinicIndex.from_hospitals()
+    if not len(index):
+        return {"grids": 0, "chunks": 0, "failed_chunks": 0, "rows": 0}
+
+    if grids is None:
+        grids = GridsPopulation.objects.all()
+    rows = list(
+        grids
+        .filter(is_deleted=False, total_sum_population__gt=0)
+        .annotate(cx=CentroidX("geometry"), cy=CentroidY("geometry"))
+        .values_list("id", "cx", "cy")
+    )
+    if not rows:
+        return {"grids": 0, "chunks": 0, "failed_chunks": 0, "rows": 0}
+
+    ids, cx, cy = (np.asarray(col) for col in zip(*rows))
+    _, idx = index.nearest(cx, cy, k=nearest)
+    idx = idx.reshape(len(ids), -1)
+    candidates = [list(dict.fromkeys(row.tolist())) for row in idx]
+
+    # Соседние ячейки подряд — у них почти одни и те же ближайшие клиники
+    order = np.lexsort((cx, np.floor(cy / 0.02)))
+    chunks = list(_chunks(order, candidates, chunk_size, max_coordinates))
+
+    client = get_routing_client()
+
+    def run(chunk, destinations):
+        durations, distances = client.table(
+            [(cx[i], cy[i]) for i in chunk],
+            [(index.lon[j], index.lat[j]) for j in destinations],
+        )
+        column = {j: c for c, j in enumerate(destinations)}
+        result = []
+        for r, i in enumerate(chunk):
+            for rank, j in enumerate(candidates[i]):
+                c = column[j]
+                result.append(GridClinicTravelTime(
+                    grid_id=int(ids[i]),
+                    hospital_id=index.names[j],
+                    rank=rank,
+                    duration_s=durations[r][c],
+                    distance_m=distances[r][c] if distances else None,
+                ))
+        return [int(ids[i]) for i in chunk], result
+
+    stored, failed = 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, chunk, destinations) for chunk, destinations in chunks]
+        for future in as_completed(futures):
+            try:
+                grid_ids, objects = future.result()
+            except RoutingError as e:
+                failed += 1
+                logger.warning("Travel time chunk failed: %s", e)
+                continue
+            with transaction.atomic():
+                GridClinicTravelTime.objects.filter(grid_id__in=grid_ids).delete()
+                GridClinicTravelTime.objects.bulk_create(objects, batch_size=1000)
+            stored += len(objects)
+
+    return {"grids": len(ids), "chunks": len(chunks), "failed_chunks": failed, "rows": stored}
@@ -1,15 +1,27 @@
 from django.urls import path
-from .views import DistrictAnalyticsView, AgeStructureAnalyticsView, HighDemandZonesView, nearest_hospitals, \
-    clinic_summary, route_to_hospital, export_district_stats_excel, export_hospitals_excel, export_high_demand_excel
+from .views import DistrictAnalyticsView, AgeStructureAnalyticsView, HighDemandZonesView, DriveTimeCoverageView, CoveragePlanView, nearest_hospitals, \
+    clinic_summary, route_to_hospital, cache_stats, export_district_stats_excel, export_hospitals_excel, export_high_demand_excel, \
+    create_export_job, export_job_status, download_export_job, age_cube, AccessibilityDistrictsView, accessibility_grids, \
+    accessibility_clinics
 
 urlpatterns = [
     path('district-stats/', DistrictAnalyticsView.as_view(), name='district-stats'),
     path('age-structure/', AgeStructureAnalyticsView.as_view(), name='age-structure'),
+    path('age-cube/', age_cube, name='age-cube'),
     path("high-demand-zones/", HighDemandZonesView.as_view()),
+    path("accessibility/districts/", AccessibilityDistrictsView.as_view()),
+    path("accessibility/grids/", accessibility_grids),
+    path("accessibility/clinics/", accessibility_clinics),
+    path("drive-time-coverage/", DriveTimeCoverageView.as_view()),
+    path("coverage-plan/", CoveragePlanView.as_view()),
     path("nearest-hospitals/", nearest_hospitals),
     path("clinic-summary/", clinic_summary),
     path("route-to-hospital/", route_to_hospital),
+    path("cache-stats/", cache_stats),
     path('export/district-stats/', export_district_stats_excel),
     path('export/hospitals/', export_hospitals_excel),
     path('export/high-demand/', export_high_demand_excel),
+    path('export-jobs/', create_export_job),
+    path('export-jobs/<uuid:job_id>/', export_job_status),
+    path('export-jobs/<uuid:job_id>/download/', download_export_job),
 ]
\ No newline at end of file
@@ -1,349 +1,402 @@
-import requests
-from collections import defaultdict
-from django.db.models import Sum
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from clinics.categories import filter_by_category
 from clinics.models import Hospital
 from population.models import GridsPopulation
 from django.contrib.gis.geos import Point
-from geography.models import AddressCityDistrict
-from django.db.models import Count
+from geography.districts import filter_by_district
+from django.db.models import Min
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
-from .models import CachedHighDemandZone
-import pandas as pd
-from django.http import HttpResponse
-from django.db.models import Sum
-from collections import defaultdict
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from .models import ExportJob, HighDemandRefreshState
+from .high_demand import refresh_high_demand_zones
+from .coverage import MAX_RADIUS_KM, MAX_SITES
+from .spatial import KNNDistance
+from . import precompute
+from .cache_tags import HOSPITALS_BULK, hospital_area_tags_near, hospital_tag
+from .exports import EXPORTS, FORMATS, export_response
+from .export_jobs import export_storage, submit_export_job
+from .routing import RouteNotFound, RoutingError, RoutingUnavailable, get_async_routing_client
+from .geo_cache import QuantizedCache, geodesic_km, normalize_filter
+import numpy as np
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
 
-@method_decorator(cache_page(60 * 15), name='dispatch')
 class DistrictAnalyticsView(APIView):
     def get(self, request):
-        # Собираем население по районам
-        population_data = (
-            GridsPopulation.objects
-            .filter(is_deleted=False)
-            .values('name_region')
-            .annotate(total_population=Sum('total_sum_population'))
-        )
-        population_by_region = {entry['name_region']: entry['total_population'] for entry in population_data}
-
-        # Собираем клиники по районам
-        hospital_data = (
-            Hospital.objects
-            .values('district')
-        )
-        clinic_count_by_region = defaultdict(int)
-        for hospital in hospital_data:
-            name = hospital['district']
-            if name:
-                clinic_count_by_region[name] += 1
-
-        # Собираем всё вместе
-        result = []
-        for district, population in population_by_region.items():
-            clinics = clinic_count_by_region.get(district, 0)
-            if clinics > 0:
-                ppl_per_clinic = round(population / clinics)
-            else:
-                ppl_per_clinic = None
-
-            status_value = "overloaded" if ppl_per_clinic and ppl_per_clinic > 15000 else "normal"
-
-            result.append({
-                "district": district,
-                "population": population,
-                "clinic_count": clinics,
-                "population_per_clinic": ppl_per_clinic,
-                "status": status_value
-            })
-
-        return Response(result, status=status.HTTP_200_OK)
+        return Response(precompute.district_stats(), status=status.HTTP_200_OK)
 
 
-@method_decorator(cache_page(60 * 15), name='dispatch')
 class AgeStructureAnalyticsView(APIView):
     def get(self, request):
-        district = request.query_params.get("district")
+        data = precompute.age_structure(request.query_params.get("district"))
+        return Response(data, status=status.HTTP_200_OK)
 
-        queryset = GridsPopulation.objects.filter(is_deleted=False)
 
-        if district and district != "Все районы":
-            queryset = queryset.filter(name_region=district)
-
-        data = queryset.aggregate(
-            f0_14=Sum("f0_14"),
-            f15_25=Sum("f15_25"),
-            f26_35=Sum("f26_35"),
-            f36_45=Sum("f36_45"),
-            f46_55=Sum("f46_55"),
-            f56_65=Sum("f56_65"),
-            f66=Sum("f66"),
-        )
+@require_GET
+def age_cube(request):
+    """Весь куб район × возрастная группа; ?grids=1 — ещё и по ячейкам.
 
-        return Response(data, status=status.HTTP_200_OK)
+    Дашборд берёт его один раз и режет на клиенте; повторные запросы с
+    If-None-Match получают 304, пока данные не изменились.
+    """
+    per_grid = request.GET.get("grids") in ("1", "true")
+    quoted_etag = f'"{precompute.age_cube_etag(per_grid)}"'
+
+    response = get_conditional_response(request, etag=quoted_etag)
+    if response is None:
+        response = JsonResponse(precompute.age_cube(per_grid))
+    response["ETag"] = quoted_etag
+    response["Cache-Control"] = "no-cache"  # можно хранить, но перед использованием сверять ETag
+    return response
+
+
+class AccessibilityDistrictsView(APIView):
+    """Доступность клиник (E2SFCA) по районам — замена population_per_clinic."""
+
+    def get(self, request):
+        return Response(precompute.accessibility_districts(), status=status.HTTP_200_OK)
+
+
+@require_GET
+def accessibility_grids(request):
+    """Доступность по ячейкам для хороплета; как age-cube — с ETag и 304."""
+    quoted_etag = f'"{precompute.accessibility_grids_etag()}"'
+    response = get_conditional_response(request, etag=quoted_etag)
+    if response is None:
+        response = JsonResponse(precompute.accessibility_grids())
+    response["ETag"] = quoted_etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@api_view(['GET'])
+def accessibility_clinics(request):
+    clinics = precompute.accessibility_clinics()
+    name = request.query_params.get("name")
+    if name is None:
+        return Response(clinics, status=status.HTTP_200_OK)
+    if name not in clinics:
+        return Response({"error": "Clinic not found or has no coordinates"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"name": name, **clinics[name]}, status=status.HTTP_200_OK)
 
 
-_cached_high_demand_zones = None
-@method_decorator(cache_page(60 * 15), name='dispatch')
 class HighDemandZonesView(APIView):
     def get(self, request):
-        global _cached_high_demand_zones
+        return Response(precompute.high_demand_zones(), status=status.HTTP_200_OK)
+
 
-        if _cached_high_demand_zones is not None:
-            return Response(_cached_high_demand_zones)
+class CoveragePlanView(APIView):
+    """Где открыть n новых клиник, чтобы покрыть больше всего людей в радиусе radius_km."""
 
-        threshold_population = 1500
-        min_distance_km = 1.0  # минимальное расстояние до ближайшей клиники в км
-        min_degree_distance = min_distance_km / 111  # 1 градус ≈ 111 км
+    def get(self, request):
+        try:
+            n = int(request.query_params.get("n", 5))
+            # Радиус округляется до 100 м — иначе каждый запрос получал бы свой ключ кэша
+            radius_km = round(float(request.query_params.get("radius_km", 1.0)), 1)
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid n or radius_km"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= n <= MAX_SITES:
+            return Response({"error": f"n must be between 1 and {MAX_SITES}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < radius_km <= MAX_RADIUS_KM:
+            return Response({"error": f"radius_km must be in (0, {MAX_RADIUS_KM:g}]"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        data = precompute.coverage_plan(n, radius_km, request.query_params.get("district"))
+        return Response(data, status=status.HTTP_200_OK)
 
-        hospitals = list(Hospital.objects.exclude(x__isnull=True, y__isnull=True).values_list("x", "y"))
 
-        grids = GridsPopulation.objects.filter(
-            is_deleted=False,
-            total_sum_population__gte=threshold_population
+@method_decorator(cache_page(60 * 15), name='dispatch')
+class DriveTimeCoverageView(APIView):
+    def get(self, request):
+        try:
+            minutes = float(request.query_params.get("minutes", 15))
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid minutes parameter"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Время до ближайшей клиники — из предрасчитанной матрицы (build_travel_time_matrix)
+        grids = GridsPopulation.objects.filter(is_deleted=False, travel_times__isnull=False)
+        district = request.query_params.get("district")
+        if district and district != "Все районы":
+            grids = filter_by_district(grids, district, "name_region")
+
+        rows = (
+            grids
+            .values("id", "name_region", "total_sum_population")
+            .annotate(nearest_duration_s=Min("travel_times__duration_s"))
+            .order_by("id")
         )
 
-        results = []
-
-        for grid in grids:
-            grid_point = grid.geometry.centroid
-            is_far = all(Point(hx, hy).distance(grid_point) > min_degree_distance for hx, hy in hospitals)
-
-            if is_far:
-                priority = (
-                    "critical" if grid.total_sum_population >= 5000 else
-                    "high" if grid.total_sum_population >= 3000 else
-                    "moderate"
-                )
-
-                results.append({
-                    "id": grid.id,
-                    "x": grid_point.x,
-                    "y": grid_point.y,
-                    "population": grid.total_sum_population,
-                    "district": grid.name_region,
-                    "geometry": grid.geometry.geojson,
-                    "priority": priority,
+        limit_s = minutes * 60
+        total_population = 0
+        uncovered = []
+        for row in rows:
+            total_population += row["total_sum_population"]
+            duration = row["nearest_duration_s"]
+            if duration is None or duration > limit_s:
+                uncovered.append({
+                    "id": row["id"],
+                    "district": row["name_region"],
+                    "population": row["total_sum_population"],
+                    "nearest_minutes": round(duration / 60, 1) if duration is not None else None,
                 })
 
-        _cached_high_demand_zones = results
-        return Response(results, status=status.HTTP_200_OK)
+        uncovered_population = sum(z["population"] for z in uncovered)
+        return Response({
+            "minutes": minutes,
+            "grids": len(rows),
+            "population": total_population,
+            "covered_population": total_population - uncovered_population,
+            "uncovered_population": uncovered_population,
+            "uncovered": uncovered,
+        }, status=status.HTTP_200_OK)
 
 
+nearest_cache = QuantizedCache(
+    "nearest-hospitals", settings.NEAREST_CACHE_PRECISION_DEG, settings.NEAREST_CACHE_TIMEOUT
+)
+route_cache = QuantizedCache(
+    "route-to-hospital", settings.ROUTE_CACHE_PRECISION_DEG, settings.ROUTE_CACHE_TIMEOUT,
+    local_size=settings.ROUTE_CACHE_LOCAL_SIZE,
+)
 
-@cache_page(60 * 15)
-@api_view(['GET'])
-def nearest_hospitals(request):
-    try:
-        lat = float(request.query_params.get('lat'))
-        lon = float(request.query_params.get('lon'))
-    except (TypeError, ValueError):
-        return Response({"error": "Invalid or missing lat/lon parameters"}, status=status.HTTP_400_BAD_REQUEST)
 
-    user_location = Point(lon, lat, srid=4326)
+def _nearest_candidates(cell_lon, cell_lat, pad_km, k, radius_km, district, category):
+    """Клиники, среди которых точно есть k ближайших для любой точки ячейки.
+
+    Если d_k — расстояние от центра ячейки до k-й клиники, а pad_km — половина
+    диагонали ячейки, то k ближайших к любой её точке лежат в d_k + 2·pad_km от центра.
+    """
+    center = Point(cell_lon, cell_lat, srid=4326)
 
     # Базовый queryset
-    hospitals = Hospital.objects.exclude(x__isnull=True).exclude(y__isnull=True)
+    hospitals = Hospital.objects.filter(location__isnull=False)
 
     #Фильтрация по району
-    district = request.query_params.get("district")
     if district:
-        hospitals = hospitals.filter(district__icontains=district)
+        hospitals = filter_by_district(hospitals, district, "district__icontains")
 
-    #Фильтрация по ключевому слову в специализации
-    category = request.query_params.get("category")
+    # Фильтрация по рубрике: теги по словарю снимка, клиники — по GIN-индексу category_tags
     if category:
-        hospitals = hospitals.filter(categories__icontains=category)
+        hospitals = filter_by_category(hospitals, category)
 
-    results = []
-    for h in hospitals:
-        hosp_point = Point(h.x, h.y, srid=4326)
-        distance_km = user_location.distance(hosp_point) * 111
+    # KNN по GiST-индексу: <-> на geography даёт порядок по геодезическому расстоянию
+    kth = list(
+        hospitals
+        .annotate(distance=Distance("location", center))
+        .order_by(KNNDistance("location", center))
+        .values_list("distance", flat=True)[k - 1:k]
+    )
 
-        results.append({
-            "name": h.name,
-            "address": h.address,
-            "district": h.district,
-            "distance_km": round(distance_km, 2),
-            "phone": h.phone_1,
-            "website": h.website_1,
-            "categories": h.categories,
-        })
+    reach_km = kth[0].km + 2 * pad_km if kth else None
+    if radius_km is not None:
+        reach_km = radius_km + pad_km if reach_km is None else min(reach_km, radius_km + pad_km)
+    if reach_km is not None:
+        hospitals = hospitals.filter(location__dwithin=(center, D(km=reach_km)))
 
-    sorted_results = sorted(results, key=lambda x: x["distance_km"])[:5]
+    # reach_km — до куда дотягиваются кандидаты (None — по всему городу)
+    candidates = hospitals.values("name", "address", "district", "phone_1", "website_1", "categories", "x", "y")
+    return list(candidates), reach_km
 
-    return Response(sorted_results, status=status.HTTP_200_OK)
 
-@cache_page(60 * 15)
 @api_view(['GET'])
-def clinic_summary(request):
-    hospitals = Hospital.objects.exclude(district__isnull=True).exclude(district="")
+def nearest_hospitals(request):
+    try:
+        lat = float(request.query_params.get('lat'))
+        lon = float(request.query_params.get('lon'))
+    except (TypeError, ValueError):
+        return Response({"error": "Invalid or missing lat/lon parameters"}, status=status.HTTP_400_BAD_REQUEST)
 
-    total_clinics = hospitals.count()
+    try:
+        k = int(request.query_params.get('k', settings.NEAREST_HOSPITALS_DEFAULT_K))
+        radius_km = request.query_params.get('radius_km')
+        radius_km = float(radius_km) if radius_km else None
+    except (TypeError, ValueError):
+        return Response({"error": "Invalid k or radius_km parameters"}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= k <= settings.NEAREST_HOSPITALS_MAX_K or (radius_km is not None and radius_km <= 0):
+        return Response({"error": "Invalid k or radius_km parameters"}, status=status.HTTP_400_BAD_REQUEST)
+
+    district = normalize_filter(request.query_params.get("district"))
+    category = normalize_filter(request.query_params.get("category"))
+
+    # Кандидаты кэшируются на ячейку сетки, ранжирование — точно для реальной точки
+    cell_lon, cell_lat = nearest_cache.snap(lon, lat)
+    # Запись зависит только от клиник вокруг ячейки: теги — участки в NEAREST_CACHE_REACH_KM
+    tags = hospital_area_tags_near(cell_lon, cell_lat, settings.NEAREST_CACHE_REACH_KM) + [HOSPITALS_BULK]
+    key = nearest_cache.key(lon, lat, tags=tags, k=k, radius_km=radius_km, district=district, category=category)
+    candidates = nearest_cache.get(key)
+    if candidates is None:
+        candidates, reach_km = _nearest_candidates(
+            cell_lon, cell_lat, nearest_cache.half_diagonal_km(cell_lat), k, radius_km, district, category
+        )
+        # Кандидатов дальше покрытых тегами участков не кэшируем: их изменения теги не увидят
+        if reach_km is not None and reach_km <= settings.NEAREST_CACHE_REACH_KM:
+            nearest_cache.set(key, candidates)
 
-    clinics_by_district = (
-        hospitals
-        .values('district')
-        .annotate(count=Count('name'))
-        .order_by('-count')
-    )
+    results = []
+    if candidates:
+        distances = geodesic_km(lon, lat, [h["x"] for h in candidates], [h["y"] for h in candidates])
+        for i in np.argsort(distances, kind="stable")[:k]:
+            if radius_km is not None and distances[i] > radius_km:
+                break
+            h = candidates[i]
+            results.append({
+                "name": h["name"],
+                "address": h["address"],
+                "district": h["district"],
+                "distance_km": round(float(distances[i]), 2),
+                "distance_m": round(float(distances[i]) * 1000),
+                "phone": h["phone_1"],
+                "website": h["website_1"],
+                "categories": h["categories"],
+            })
 
-    districts_covered = clinics_by_district.count()
+    return Response(results, status=status.HTTP_200_OK)
 
-    if clinics_by_district:
-        max_district = clinics_by_district[0]
-        min_district = clinics_by_district.last()
-        avg = total_clinics / districts_covered if districts_covered else 0
-    else:
-        max_district = {"district": None, "count": 0}
-        min_district = {"district": None, "count": 0}
-        avg = 0
+@api_view(['GET'])
+def clinic_summary(request):
+    return Response(precompute.clinic_summary())
 
-    return Response({
-        "total_clinics": total_clinics,
-        "districts_covered": districts_covered,
-        "average_clinics_per_district": round(avg, 2),
-        "max_clinic_district": max_district['district'],
-        "min_clinic_district": min_district['district']
-    })
+def _cached_route(user_lon, user_lat, hospital_name):
+    key = route_cache.key(
+        user_lon, user_lat, tags=[hospital_tag(hospital_name), HOSPITALS_BULK], hospital=hospital_name
+    )
+    return key, route_cache.get(key)
 
-@cache_page(60 * 15)
-@api_view(['GET'])
-def route_to_hospital(request):
-    try:
-        user_lat = float(request.query_params.get("lat"))
-        user_lon = float(request.query_params.get("lon"))
-        hospital_name = request.query_params.get("hospital_name")
-    except (ValueError, TypeError):
-        return Response({"error": "Missing or invalid parameters"}, status=400)
 
+# Async: пока ждём сервис маршрутов, воркер обслуживает другие запросы
+@require_GET
+async def route_to_hospital(request):
     try:
-        hospital = Hospital.objects.get(name=hospital_name)
-        if hospital.x is None or hospital.y is None:
-            return Response({"error": "Hospital coordinates missing"}, status=400)
-    except Hospital.DoesNotExist:
-        return Response({"error": "Hospital not found"}, status=404)
-
-    # OSRM API (можно заменить на свой локальный сервер или Mapbox)
-    url = f"http://router.project-osrm.org/route/v1/driving/{user_lon},{user_lat};{hospital.x},{hospital.y}?overview=full&geometries=geojson"
+        user_lat = float(request.GET.get("lat"))
+        user_lon = float(request.GET.get("lon"))
+        hospital_name = request.GET.get("hospital_name")
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "Missing or invalid parameters"}, status=400)
 
-    res = requests.get(url)
-    if res.status_code != 200:
-        return Response({"error": "Failed to fetch route"}, status=500)
+    # Маршрут строится от центра ячейки, чтобы его могли переиспользовать соседи
+    origin_lon, origin_lat = route_cache.snap(user_lon, user_lat)
+    key, cached = await sync_to_async(_cached_route)(user_lon, user_lat, hospital_name)
+    if cached is not None:
+        return JsonResponse(cached)
 
-    route_data = res.json()
-    route = route_data["routes"][0]
+    hospital = await Hospital.objects.filter(name=hospital_name).values("name", "x", "y").afirst()
+    if hospital is None:
+        return JsonResponse({"error": "Hospital not found"}, status=404)
+    if hospital["x"] is None or hospital["y"] is None:
+        return JsonResponse({"error": "Hospital coordinates missing"}, status=400)
 
-    return Response({
-        "hospital": hospital.name,
+    # OSRM-совместимый сервис: адрес задаётся ROUTING_BASE_URL (свой сервер или заглушка)
+    try:
+        route = await get_async_routing_client().route((origin_lon, origin_lat), (hospital["x"], hospital["y"]))
+    except RouteNotFound:
+        return JsonResponse({"error": "Route not found"}, status=404)
+    except RoutingUnavailable:
+        return JsonResponse({"error": "Routing service unavailable"}, status=503)
+    except RoutingError:
+        return JsonResponse({"error": "Failed to fetch route"}, status=500)
+
+    result = {
+        "hospital": hospital["name"],
         "distance_km": round(route["distance"] / 1000, 2),
         "duration_min": round(route["duration"] / 60, 1),
         "route_geometry": route["geometry"]
-    })
+    }
+    await sync_to_async(route_cache.set)(key, result)
+    return JsonResponse(result)
 
 
 @api_view(['GET'])
-def export_district_stats_excel(request):
-    # Собираем данные как в district-stats
-    population_data = (
-        GridsPopulation.objects
-        .filter(is_deleted=False)
-        .values('name_region')
-        .annotate(total_population=Sum('total_sum_population'))
-    )
-    population_by_region = {entry['name_region']: entry['total_population'] for entry in population_data}
-
-    hospital_data = Hospital.objects.values('district')
-    clinic_count_by_region = defaultdict(int)
-    for hospital in hospital_data:
-        name = hospital['district']
-        if name:
-            clinic_count_by_region[name] += 1
-
-    export_data = []
-    for district, population in population_by_region.items():
-        clinics = clinic_count_by_region.get(district, 0)
-        ppl_per_clinic = round(population / clinics) if clinics > 0 else None
-
-        if ppl_per_clinic is None:
-            status = "no clinics"
-        elif ppl_per_clinic > 20000:
-            status = "critical"
-        elif ppl_per_clinic > 15000:
-            status = "warning"
-        else:
-            status = "normal"
-
-        export_data.append({
-            "Район": district,
-            "Население": population,
-            "Клиник": clinics,
-            "Чел. на 1 клинику": ppl_per_clinic,
-            "Статус": status
-        })
-
-    df = pd.DataFrame(export_data)
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=district_stats.xlsx'
-    df.to_excel(response, index=False, engine='openpyxl')
+def cache_stats(request):
+    return Response({
+        nearest_cache.name: nearest_cache.stats(),
+        route_cache.name: route_cache.stats(),
+    })
 
-    return response
 
-@api_view(['GET'])
-def export_hospitals_excel(request):
-    hospitals = Hospital.objects.all()
-
-    export_data = []
-
-    for h in hospitals:
-        export_data.append({
-            "Название": h.name,
-            "Район": h.district,
-            "Адрес": h.address,
-            "Город": h.city,
-            "Категории": h.categories,
-            "Часы работы": h.working_hours,
-            "Телефон": h.phone_1,
-            "Веб-сайт": h.website_1,
-            "Instagram": h.instagram,
-            "X": h.x,
-            "Y": h.y,
-        })
-
-    df = pd.DataFrame(export_data)
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=hospitals_list.xlsx'
-    df.to_excel(response, index=False, engine='openpyxl')
+def _export(request, name):
+    file_format = request.GET.get("format", "xlsx")
+    if file_format not in FORMATS:
+        return JsonResponse({"error": f"Unsupported format, use one of: {', '.join(FORMATS)}"}, status=400)
+    return export_response(name, file_format, asynchronous=isinstance(request, ASGIRequest))
 
-    return response
 
-@api_view(['GET'])
-def export_high_demand_excel(request):
-    zones = CachedHighDemandZone.objects.all()
+# Обычные Django-вьюхи: ?format= в DRF занят выбором рендерера
+@require_GET
+def export_district_stats_excel(request):
+    return _export(request, "district-stats")
+
+@require_GET
+def export_hospitals_excel(request):
+    return _export(request, "hospitals")
 
-    export_data = []
+@require_GET
+def export_high_demand_excel(request):
+    if not HighDemandRefreshState.objects.exists():
+        refresh_high_demand_zones()
+
+    return _export(request, "high-demand")
+
+
+def _export_job_payload(job):
+    payload = {
+        "id": str(job.id),
+        "export": job.export,
+        "format": job.file_format,
+        "status": job.status,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+    if job.status == ExportJob.DONE:
+        payload["download_url"] = f"/api/analytics/export-jobs/{job.id}/download/"
+    if job.status == ExportJob.FAILED:
+        payload["error"] = job.error
+    return payload
+
+
+@api_view(['POST'])
+def create_export_job(request):
+    export = request.data.get("export")
+    file_format = request.data.get("format", "xlsx")
+    if export not in EXPORTS or file_format not in FORMATS:
+        return Response(
+            {"error": f"export must be one of {', '.join(EXPORTS)}, format one of {', '.join(FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-    for z in zones:
-        export_data.append({
-            "Район": z.district,
-            "X": z.x,
-            "Y": z.y,
-            "Население": z.population,
-            "Расстояние до ближайшей клиники (км)": z.distance_km,
-            "Приоритет": z.priority,
-            "Обновлено": z.updated_at,
-        })
+    if export == "high-demand" and not HighDemandRefreshState.objects.exists():
+        refresh_high_demand_zones()
 
-    df = pd.DataFrame(export_data)
+    job, created = submit_export_job(export, file_format)
+    return Response(_export_job_payload(job), status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
 
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=high_demand_zones.xlsx'
-    df.to_excel(response, index=False, engine='openpyxl')
 
-    return response
\ No newline at end of file
+@api_view(['GET'])
+def export_job_status(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    return Response(_export_job_payload(job))
+
+
+@require_GET
+def download_export_job(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id, status=ExportJob.DONE)
+    if not export_storage.exists(job.file):
+        raise Http404("Export file is no longer available")
+
+    content_type, _ = FORMATS[job.file_format]
+    return FileResponse(
+        export_storage.open(job.file, "rb"),
+        as_attachment=True,
+        filename=f"{EXPORTS[job.export].filename}.{job.file_format}",
+        content_type=content_type,
+    )
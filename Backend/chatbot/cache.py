@@ -0,0 +1,100 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# Слова, которые меняют смысл вопроса, почти не меняя шинглов
+NEGATIONS = frozenset({"не", "нет", "без", "ни"})
+
+
+def normalize_question(text):
+    # "Где ближайшая больница?!" и "где  ближайшая больница" — один вопрос
+    text = _PUNCTUATION.sub(" ", str(text).lower().replace("ё", "е"))
+    return " ".join(text.split())
+
+
+def shingles(text, size=3):
+    """Символьные n-граммы — устойчивы к опечаткам и окончаниям слов."""
+    padded = f" {text} "
+    return {padded[i:i + size] for i in range(max(1, len(padded) - size + 1))}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def anchors(text):
+    """Числа и отрицания вопроса: похожие вопросы с разными anchors — разные вопросы."""
+    return tuple(sorted(word for word in text.split() if word.isdigit() or word in NEGATIONS))
+
+
+class ResponseCache:
+    """LRU-кэш ответов бота с TTL в памяти процесса.
+
+    Ответ находится по точному совпадению нормализованного вопроса или по
+    похожему вопросу (Jaccard по шинглам не ниже similarity, те же числа и
+    отрицания) — но только среди ответов с той же подписью контекста: вопросы
+    про разные районы не смешиваются.
+    """
+
+    def __init__(self, maxsize, timeout, similarity):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.similarity = similarity
+        self._data = OrderedDict()  # (подпись, вопрос) -> (истекает, шинглы, anchors, ответ)
+        self._by_signature = {}  # подпись -> ключи _data с этой подписью
+        self._lock = threading.Lock()
+
+    def get(self, question, signature=""):
+        question = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            key = (signature, question)
+            item = self._data.get(key)
+            if item is None:
+                key, item = self._most_similar(question, signature, now)
+            if item is None:
+                return None
+            expires_at, _, _, answer = item
+            if expires_at < now:
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return answer
+
+    def _most_similar(self, question, signature, now):
+        # Перебираются только ответы с той же подписью контекста
+        target, target_anchors = shingles(question), anchors(question)
+        best_key, best_item, best_score = None, None, self.similarity
+        for key in self._by_signature.get(signature, ()):
+            item = self._data[key]
+            # «больница 12» и «больница 17», «перегружены» и «не перегружены» — не одно и то же
+            if item[0] < now or item[2] != target_anchors:
+                continue
+            score = jaccard(target, item[1])
+            if score >= best_score:
+                best_key, best_item, best_score = key, item, score
+        return best_key, best_item
+
+    def _remove(self, key):
+        del self._data[key]
+        keys = self._by_signature[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_signature[key[0]]
+
+    def set(self, question, answer, signature=""):
+        question = normalize_question(question)
+        with self._lock:
+            key = (signature, question)
+            self._data[key] = (time.monotonic() + self.timeout, shingles(question), anchors(question), answer)
+            self._data.move_to_end(key)
+            self._by_signature.setdefault(signature, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_signature.clear()
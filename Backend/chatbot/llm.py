@@ -0,0 +1,120 @@
+"""Клиенты языковой модели: Groq и локальная заглушка для работы без сети.
+
+Клиент выбирается настройкой CHATBOT_BACKEND; в тестах его можно подменить
+через set_llm_client.
+"""
+import json
+import re
+
+import httpx
+from django.conf import settings
+
+from config import http
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class GroqClient:
+    def __init__(self, api_key, model, timeout):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+
+    async def complete(self, messages, temperature=0.7):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        try:
+            response = await http.request(
+                "groq", "POST", GROQ_API_URL, headers=headers, json=payload, timeout=self.timeout
+            )
+        except httpx.TimeoutException as e:
+            raise LLMTimeout("Chat service timed out") from e
+        except httpx.HTTPError as e:
+            raise LLMError(str(e)) from e
+
+        if response.status_code != 200:
+            raise LLMError(f"Chat service responded with {response.status_code}")
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMError("Invalid response from chat service") from e
+
+    async def stream(self, messages, temperature=0.7):
+        """Части ответа по мере генерации (SSE в формате OpenAI)."""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {"model": self.model, "messages": messages, "temperature": temperature, "stream": True}
+        try:
+            async with http.stream(
+                "groq", "POST", GROQ_API_URL, headers=headers, json=payload, timeout=self.timeout
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise LLMError(f"Chat service responded with {response.status_code}")
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0]["delta"].get("content")
+                    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                        raise LLMError("Invalid response from chat service") from e
+                    if delta:
+                        yield delta
+        except httpx.TimeoutException as e:
+            raise LLMTimeout("Chat service timed out") from e
+        except httpx.HTTPError as e:
+            raise LLMError(str(e)) from e
+
+
+class LocalLLMClient:
+    """Детерминированная заглушка: возвращает найденные данные без обращения к модели."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, messages, temperature=0.7):
+        self.calls.append(messages)
+        context = [m["content"] for m in messages[1:-1] if m["role"] == "system"]
+        question = messages[-1]["content"]
+        if context:
+            return f"По данным Health Map на вопрос «{question}»:\n" + "\n".join(context)
+        return f"Локальный режим: на вопрос «{question}» нет данных Health Map."
+
+    async def stream(self, messages, temperature=0.7):
+        reply = await self.complete(messages, temperature)
+        for token in re.findall(r"\S+\s*", reply):
+            yield token
+
+
+_client = None
+
+
+def get_llm_client():
+    global _client
+    if _client is None:
+        if settings.CHATBOT_BACKEND == "local":
+            _client = LocalLLMClient()
+        else:
+            _client = GroqClient(settings.GROQ_API_KEY, settings.CHATBOT_MODEL, settings.CHATBOT_TIMEOUT)
+    return _client
+
+
+def set_llm_client(client):
+    global _client
+    _client = client
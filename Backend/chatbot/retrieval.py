@@ -0,0 +1,104 @@
+"""Данные Health Map, относящиеся к вопросу, — подставляются в промпт бота.
+
+В промпт попадают только упомянутые районы и подходящие клиники, а не вся база;
+по подписи контекста ResponseCache отличает ответы с разными данными.
+"""
+import hashlib
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+from analytics import precompute
+from analytics.snapshot import get_hospital_snapshot
+from clinics.models import Hospital
+from geography.districts import normalize_district_name, resolve_district
+from .cache import normalize_question
+
+# Начала слов: "больниц" ловит «больница», «больницы», «больницу»
+CLINIC_WORDS = ("клиник", "больниц", "поликлиник", "медцентр", "госпитал", "врач")
+STATS_WORDS = ("нагрузк", "перегруж", "населен", "жител", "статистик")
+STEM_LENGTH = 6
+
+
+@dataclass
+class Context:
+    lines: list = field(default_factory=list)
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+    @property
+    def signature(self):
+        return hashlib.md5(self.text.encode("utf-8")).hexdigest() if self.lines else ""
+
+
+def _mentions(words, stems):
+    return any(word.startswith(stem) for word in words for stem in stems)
+
+
+def _mentioned_districts(words, rows):
+    mentioned = []
+    for row in rows:
+        if not row["district"]:
+            continue
+        stem = normalize_district_name(row["district"]).split()[0][:STEM_LENGTH]
+        if _mentions(words, [stem]):
+            mentioned.append(row)
+    return mentioned
+
+
+def _district_line(row):
+    per_clinic = row["population_per_clinic"] if row["population_per_clinic"] is not None else "нет клиник"
+    status = "перегружен" if row["status"] == "overloaded" else "в норме"
+    return (f"- {row['district']}: население {row['population']}, клиник {row['clinic_count']}, "
+            f"жителей на клинику {per_clinic}, {status}")
+
+
+def _clinics(words, district_ids):
+    # Рубрики — по словарю снимка клиник, совпадение по началу слова вопроса
+    snapshot = get_hospital_snapshot()
+    tags = {tag for word in words if len(word) >= 5 for tag in snapshot.matching_categories(word[:-2])}
+    if not tags and not _mentions(words, CLINIC_WORDS):
+        return []
+
+    query = SearchQuery(" or ".join(words), config="russian", search_type="websearch")
+    hospitals = Hospital.objects.all()
+    if district_ids:
+        hospitals = hospitals.filter(city_district_id__in=district_ids)
+    if tags:
+        hospitals = hospitals.filter(category_tags__overlap=sorted(tags))
+    elif not district_ids:
+        hospitals = hospitals.filter(search_vector=query)
+    return list(
+        hospitals
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "name")
+        .values("name", "address", "phone_1", "categories")[:settings.CHATBOT_CONTEXT_CLINICS]
+    )
+
+
+def retrieve(question):
+    words = normalize_question(question).split()
+    context = Context()
+    if not words:
+        return context
+
+    rows = precompute.district_stats()
+    districts = _mentioned_districts(words, rows)
+    if districts or _mentions(words, STATS_WORDS):
+        context.lines.append("Районы Алматы (население, клиники, нагрузка):")
+        context.lines.extend(_district_line(row) for row in (districts or rows))
+
+    district_ids = [d.id for d in (resolve_district(row["district"]) for row in districts) if d is not None]
+    clinics = _clinics(words, district_ids)
+    if clinics:
+        context.lines.append("Клиники:")
+        context.lines.extend(
+            f"- {c['name']}; адрес: {c['address'] or 'не указан'}; телефон: {c['phone_1'] or 'не указан'}; "
+            f"рубрики: {c['categories'] or 'не указаны'}"
+            for c in clinics
+        )
+    return context
@@ -1,3 +1,180 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from . import views
+from .cache import ResponseCache, jaccard, normalize_question, shingles
+from .llm import LocalLLMClient, set_llm_client
+from .retrieval import Context, retrieve
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = ResponseCache(maxsize=10, timeout=60, similarity=0.8)
+
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question("Где  ближайшая БОЛЬНИЦА?!"), "где ближайшая больница")
+        self.assertEqual(normalize_question("Всё ещё"), "все еще")
+
+    def test_jaccard(self):
+        self.assertEqual(jaccard(shingles("абв"), shingles("абв")), 1.0)
+        self.assertLess(jaccard(shingles("абв"), shingles("где")), 0.5)
+
+    def test_exact_hit(self):
+        self.cache.set("Где ближайшая больница?", "ответ")
+        self.assertEqual(self.cache.get("где  ближайшая больница"), "ответ")
+
+    def test_similar_hit(self):
+        self.cache.set("где ближайшая больница в алмалинском районе", "ответ")
+        self.assertEqual(self.cache.get("где ближайшая больница в алмалинском раионе"), "ответ")
+
+    def test_negation_is_not_similar(self):
+        self.cache.set("какие больницы перегружены", "перегружены")
+        self.assertIsNone(self.cache.get("какие больницы не перегружены"))
+
+    def test_numbers_are_not_similar(self):
+        self.cache.set("как доехать до больницы 12", "к 12-й")
+        self.assertIsNone(self.cache.get("как доехать до больницы 17"))
+        self.assertEqual(self.cache.get("как доехать до больницы 12?"), "к 12-й")
+
+    def test_dissimilar_miss(self):
+        self.cache.set("где ближайшая больница", "ответ")
+        self.assertIsNone(self.cache.get("сколько жителей в районе"))
+
+    def test_signatures_never_share_answers(self):
+        self.cache.set("где ближайшая больница", "про район А", signature="a")
+        self.assertIsNone(self.cache.get("где ближайшая больница", signature="b"))
+        self.assertIsNone(self.cache.get("где ближайшая больницa", signature="b"))
+        self.assertIsNone(self.cache.get("где ближайшая больница"))
+
+        self.cache.set("где ближайшая больница", "про район Б", signature="b")
+        self.assertEqual(self.cache.get("где ближайшая больница", signature="a"), "про район А")
+        self.assertEqual(self.cache.get("где ближайшая больница", signature="b"), "про район Б")
+
+    def test_ttl_expiry(self):
+        with mock.patch("chatbot.cache.time.monotonic", return_value=1000.0):
+            self.cache.set("где ближайшая больница", "ответ")
+        with mock.patch("chatbot.cache.time.monotonic", return_value=1059.0):
+            self.assertEqual(self.cache.get("где ближайшая больница"), "ответ")
+        with mock.patch("chatbot.cache.time.monotonic", return_value=1061.0):
+            self.assertIsNone(self.cache.get("где ближайшая больница"))
+            self.assertIsNone(self.cache.get("где ближайшая больницы"))
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(maxsize=2, timeout=60, similarity=0.8)
+        cache.set("первый вопрос", "1")
+        cache.set("второй вопрос", "2")
+        self.assertEqual(cache.get("первый вопрос"), "1")  # теперь второй — самый старый
+        cache.set("третий вопрос", "3")
+
+        self.assertEqual(cache.get("первый вопрос"), "1")
+        self.assertIsNone(cache.get("второй вопрос"))
+        self.assertEqual(cache.get("третий вопрос"), "3")
+
+
+class ChatbotAskTests(SimpleTestCase):
+    def setUp(self):
+        self.llm = LocalLLMClient()
+        set_llm_client(self.llm)
+        self.addCleanup(set_llm_client, None)
+        views.response_cache.clear()
+        self.addCleanup(views.response_cache.clear)
+
+    def ask(self, message, context=None):
+        with mock.patch("chatbot.views.retrieve", return_value=context or Context()):
+            return self.client.post(
+                "/api/chatbot/ask/", data=json.dumps({"message": message}), content_type="application/json"
+            )
+
+    def test_requires_message(self):
+        response = self.ask("")
+        self.assertEqual(response.status_code, 400)
+
+    def test_second_question_is_cached(self):
+        first = self.ask("Где ближайшая больница?")
+        second = self.ask("где ближайшая больница")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.json()["cached"])
+        self.assertTrue(second.json()["cached"])
+        self.assertEqual(first.json()["reply"], second.json()["reply"])
+        self.assertEqual(len(self.llm.calls), 1)
+
+    def test_context_is_passed_and_scopes_cache(self):
+        almaly = Context(["- Алмалинский район: население 1000"])
+        bostandyk = Context(["- Бостандыкский район: население 2000"])
+
+        first = self.ask("сколько жителей", almaly)
+        second = self.ask("сколько жителей", bostandyk)
+
+        self.assertIn("Алмалинский", first.json()["reply"])
+        self.assertFalse(second.json()["cached"])
+        self.assertIn("Бостандыкский", second.json()["reply"])
+        self.assertEqual(len(self.llm.calls), 2)
+
+
+class RetrieveTests(SimpleTestCase):
+    ROWS = [
+        {"district": "Алмалинский район", "population": 1000, "clinic_count": 2,
+         "population_per_clinic": 500, "status": "normal"},
+        {"district": "Бостандыкский район", "population": 2000, "clinic_count": 0,
+         "population_per_clinic": None, "status": "overloaded"},
+    ]
+    CLINIC = {"name": "Поликлиника №1", "address": "ул. Абая, 1", "phone_1": None, "categories": "Поликлиники"}
+
+    def setUp(self):
+        self.hospitals = mock.MagicMock()
+        for method in ("all", "filter", "annotate", "order_by"):
+            getattr(self.hospitals, method).return_value = self.hospitals
+        self.hospitals.values.return_value = [self.CLINIC]
+
+        self.snapshot = mock.Mock()
+        self.snapshot.matching_categories.side_effect = (
+            lambda query: ["стоматология"] if query.startswith("стомат") else []
+        )
+
+        patches = [
+            mock.patch("chatbot.retrieval.precompute.district_stats", return_value=self.ROWS),
+            mock.patch("chatbot.retrieval.resolve_district",
+                       side_effect=lambda name: mock.Mock(id=1) if name.startswith("Алмалин") else None),
+            mock.patch("chatbot.retrieval.get_hospital_snapshot", return_value=self.snapshot),
+            mock.patch("chatbot.retrieval.Hospital.objects", self.hospitals),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_empty_question(self):
+        context = retrieve("?!")
+        self.assertEqual(context.lines, [])
+        self.assertEqual(context.signature, "")
+
+    def test_mentioned_district_only(self):
+        context = retrieve("Сколько жителей в Алмалинском районе?")
+
+        self.assertIn("- Алмалинский район: население 1000, клиник 2, жителей на клинику 500, в норме", context.lines)
+        self.assertFalse(any("Бостандыкский" in line for line in context.lines))
+        self.hospitals.all.assert_not_called()
+
+    def test_stats_question_lists_all_districts(self):
+        context = retrieve("какие районы перегружены")
+        self.assertIn("- Бостандыкский район: население 2000, клиник 0, жителей на клинику нет клиник, перегружен",
+                      context.lines)
+        self.assertEqual(len(context.lines), 3)
+
+    def test_clinics_in_district(self):
+        context = retrieve("где поликлиника в алмалинском районе")
+
+        self.hospitals.filter.assert_called_once_with(city_district_id__in=[1])
+        self.assertIn("Клиники:", context.lines)
+        self.assertIn("- Поликлиника №1; адрес: ул. Абая, 1; телефон: не указан; рубрики: Поликлиники", context.lines)
+
+    def test_category_filter(self):
+        retrieve("нужна стоматология")
+        self.hospitals.filter.assert_called_once_with(category_tags__overlap=["стоматология"])
+
+    def test_signature_follows_data(self):
+        first = retrieve("сколько жителей в алмалинском районе")
+        second = retrieve("сколько жителей в бостандыкском районе")
+        self.assertNotEqual(first.signature, second.signature)
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import chatbot_ask
+from .views import chatbot_ask, chatbot_stream
 
 urlpatterns = [
     path('ask/', chatbot_ask, name='chatbot-ask'),
+    path('ask/stream/', chatbot_stream, name='chatbot-stream'),
 ]
\ No newline at end of file
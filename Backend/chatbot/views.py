@@ -1,40 +1,170 @@
-import httpx
-import os
+import json
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from rest_framework import status
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .cache import ResponseCache
+from .llm import LLMError, LLMTimeout, get_llm_client
+from .retrieval import retrieve
+
+SYSTEM_PROMPT = (
+    "Ты помощник на сайте Health Map. Отвечай кратко, дружелюбно и на **русском языке**. "
+    "Ты объясняешь медицинские и аналитические термины, помогаешь найти больницы и маршруты."
+)
+CONTEXT_PROMPT = (
+    "Данные Health Map по вопросу пользователя. Опирайся на них, "
+    "а если нужного в них нет — так и скажи:\n{context}"
+)
+
+response_cache = ResponseCache(
+    settings.CHATBOT_CACHE_SIZE, settings.CHATBOT_CACHE_TIMEOUT, settings.CHATBOT_CACHE_SIMILARITY
+)
+
 
-GROQ_API_KEY = settings.GROQ_API_KEY
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+def _message(request):
+    # Фронтенд шлёт JSON, но форму тоже принимаем, как раньше через DRF
+    if request.method == "GET":
+        # EventSource умеет только GET
+        return request.GET.get("message", "").strip()
+    if request.content_type == "application/json":
+        try:
+            return (json.loads(request.body or b"{}").get("message") or "").strip()
+        except (ValueError, AttributeError):
+            return ""
+    return request.POST.get("message", "").strip()
 
-@api_view(['POST'])
-def chatbot_ask(request):
-    user_input = request.data.get('message', '')
+
+def build_messages(user_input, context):
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if context.lines:
+        messages.append({"role": "system", "content": CONTEXT_PROMPT.format(context=context.text)})
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
+
+# Async: ответ модели ждём до CHATBOT_TIMEOUT секунд, не занимая воркер
+@csrf_exempt
+@require_POST
+async def chatbot_ask(request):
+    user_input = _message(request)
     if not user_input:
-        return Response({'error': 'No message provided'}, status=status.HTTP_400_BAD_REQUEST)
-
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": "llama3-8b-8192",  # можно позже поменять на более мощную модель
-        "messages": [
-            {"role": "system", "content": (
-                "Ты помощник на сайте Health Map. Отвечай кратко, дружелюбно и на **русском языке**. "
-                "Ты объясняешь медицинские и аналитические термины, помогаешь найти больницы и маршруты."
-            )},
-            {"role": "user", "content": user_input}
-        ],
-        "temperature": 0.7
-    }
+        return JsonResponse({'error': 'No message provided'}, status=400)
+
+    # Сначала данные: от них зависит, можно ли переиспользовать готовый ответ
+    context = await sync_to_async(retrieve)(user_input)
+    reply = await sync_to_async(response_cache.get, thread_sensitive=False)(user_input, context.signature)
+    if reply is not None:
+        return JsonResponse({"reply": reply, "cached": True})
 
     try:
-        response = httpx.post(GROQ_API_URL, headers=headers, json=payload, timeout=15)
-        data = response.json()
-        reply = data["choices"][0]["message"]["content"]
-        return Response({"reply": reply})
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        reply = await get_llm_client().complete(build_messages(user_input, context))
+    except LLMTimeout as e:
+        return JsonResponse({"error": str(e)}, status=504)
+    except LLMError as e:
+        return JsonResponse({"error": str(e)}, status=502)
+
+    await sync_to_async(response_cache.set, thread_sensitive=False)(user_input, reply, context.signature)
+    return JsonResponse({"reply": reply, "cached": False})
+
+
+def _sse(data, event=None):
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n" if event else f"data: {payload}\n\n"
+
+
+def _client_ip(request):
+    """IP клиента; X-Forwarded-For учитывается только от доверенных прокси.
+
+    Цепочка читается справа: первый адрес не из TRUSTED_PROXIES добавил наш
+    прокси, всё левее него клиент мог подделать.
+    """
+    ip = request.META.get("REMOTE_ADDR", "")
+    if ip not in settings.TRUSTED_PROXIES:
+        return ip
+    forwarded = [a.strip() for a in request.headers.get("X-Forwarded-For", "").split(",") if a.strip()]
+    for address in reversed(forwarded):
+        if address not in settings.TRUSTED_PROXIES:
+            return address
+    return forwarded[0] if forwarded else ip
+
+
+async def _acquire_stream_slot(client):
+    """Счётчик потоков клиента в Redis — общий для всех воркеров."""
+    key = f"chatbot:streams:{client}"
+    if not await cache.aadd(key, 0, settings.CHATBOT_STREAM_SLOT_TIMEOUT):
+        # TTL считается от последнего открытого потока, а не от первого
+        await cache.atouch(key, settings.CHATBOT_STREAM_SLOT_TIMEOUT)
+    try:
+        count = await cache.aincr(key)
+    except ValueError:
+        # Счётчик вытеснили между add и incr
+        await cache.aset(key, 1, settings.CHATBOT_STREAM_SLOT_TIMEOUT)
+        count = 1
+    if count > settings.CHATBOT_STREAMS_PER_CLIENT:
+        await _release_stream_slot(key)
+        return None
+    return key
+
+
+async def _release_stream_slot(key):
+    try:
+        await cache.adecr(key)
+    except ValueError:
+        pass  # истёк TTL — слот уже освобождён
+
+
+async def _stream_reply(user_input, slot):
+    """Части ответа как SSE-события: data {"delta"}, затем event done или error.
+
+    Генератор читает upstream только когда сервер отправил предыдущий кусок
+    клиенту, поэтому медленный клиент притормаживает и чтение из Groq. При
+    обрыве соединения Django отменяет генератор: выход из async with в
+    GroqClient.stream закрывает upstream-поток, finally освобождает слот.
+    """
+    try:
+        # Комментарий SSE: заголовки уходят клиенту сразу, до поиска данных
+        yield ": connected\n\n"
+
+        context = await sync_to_async(retrieve)(user_input)
+        reply = await sync_to_async(response_cache.get, thread_sensitive=False)(user_input, context.signature)
+        if reply is not None:
+            yield _sse({"delta": reply})
+            yield _sse({"cached": True}, event="done")
+            return
+
+        parts = []
+        try:
+            async for delta in get_llm_client().stream(build_messages(user_input, context)):
+                parts.append(delta)
+                yield _sse({"delta": delta})
+        except LLMError as e:
+            # Статус уже отправлен — об ошибке сообщаем событием
+            yield _sse({"error": str(e), "timeout": isinstance(e, LLMTimeout)}, event="error")
+            return
+
+        # В кэш — только полностью полученный ответ
+        await sync_to_async(response_cache.set, thread_sensitive=False)(user_input, "".join(parts), context.signature)
+        yield _sse({"cached": False}, event="done")
+    finally:
+        await _release_stream_slot(slot)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+async def chatbot_stream(request):
+    user_input = _message(request)
+    if not user_input:
+        return JsonResponse({'error': 'No message provided'}, status=400)
+
+    slot = await _acquire_stream_slot(_client_ip(request))
+    if slot is None:
+        return JsonResponse({'error': 'Too many concurrent streams'}, status=429)
+
+    response = StreamingHttpResponse(_stream_reply(user_input, slot), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx не должен копить поток
+    return response
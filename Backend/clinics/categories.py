@@ -0,0 +1,46 @@
+import re
+
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+# «Рубрики» 2ГИС — список через запятую: "Стоматологические клиники, Детские поликлиники".
+# Разбор совпадает с выражением CategoryTags (колонка hospitals.category_tags)
+_SEPARATORS = re.compile(r"[,;]")
+_LIKE_SPECIAL = re.compile(r"([\\%_])")
+
+
+def normalize_category(value):
+    return " ".join(str(value).split()).lower()
+
+
+def parse_categories(text):
+    """Рубрики клиники -> нормализованные теги без повторов, в исходном порядке."""
+    if not text:
+        return []
+    tags = []
+    for part in _SEPARATORS.split(text):
+        tag = normalize_category(part)
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def filter_by_category(queryset, category):
+    """Клиники с рубрикой, равной category или содержащей её.
+
+    Теги ищутся по словарю рубрик снимка, выборка — по GIN-индексу category_tags.
+    Если словарь рубрику не знает (снимок отстал от только что добавленной
+    клиники), поиск идёт подстрокой по самим тегам в БД.
+    """
+    from analytics.snapshot import get_hospital_snapshot  # snapshot сам импортирует этот модуль
+
+    tags = get_hospital_snapshot().matching_categories(category)
+    if tags:
+        return queryset.filter(category_tags__overlap=tags)
+    pattern = "%" + _LIKE_SPECIAL.sub(r"\\\1", normalize_category(category)) + "%"
+    table = queryset.model._meta.db_table
+    return queryset.filter(RawSQL(
+        f'EXISTS (SELECT 1 FROM unnest("{table}".category_tags) AS t WHERE t LIKE %s)',
+        [pattern],
+        output_field=BooleanField(),
+    ))
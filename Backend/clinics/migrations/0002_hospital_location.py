@@ -0,0 +1,41 @@
+import clinics.models
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinics', '0001_initial'),
+    ]
+
+    # Таблица hospitals не управляется Django, поэтому колонку и GiST-индекс
+    # создаём вручную, а в состояние миграций добавляем только поле
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        'ALTER TABLE hospitals ADD COLUMN IF NOT EXISTS location geography(Point, 4326) '
+                        'GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint("X", "Y"), 4326)::geography) STORED',
+                        'CREATE INDEX IF NOT EXISTS hospitals_location_gist ON hospitals USING GIST (location)',
+                    ],
+                    reverse_sql=[
+                        'DROP INDEX IF EXISTS hospitals_location_gist',
+                        'ALTER TABLE hospitals DROP COLUMN IF EXISTS location',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='hospital',
+                    name='location',
+                    field=models.GeneratedField(
+                        db_persist=True,
+                        expression=clinics.models.GeographyPoint('x', 'y'),
+                        output_field=django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326),
+                    ),
+                ),
+            ],
+        ),
+    ]
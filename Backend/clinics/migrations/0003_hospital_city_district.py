@@ -0,0 +1,34 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinics', '0002_hospital_location'),
+        ('geography', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        'ALTER TABLE hospitals ADD COLUMN IF NOT EXISTS city_district_id bigint NULL',
+                        'CREATE INDEX IF NOT EXISTS hospitals_city_district_id ON hospitals (city_district_id)',
+                    ],
+                    reverse_sql=[
+                        'DROP INDEX IF EXISTS hospitals_city_district_id',
+                        'ALTER TABLE hospitals DROP COLUMN IF EXISTS city_district_id',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='hospital',
+                    name='city_district',
+                    field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='hospitals', to='geography.addresscitydistrict'),
+                ),
+            ],
+        ),
+    ]
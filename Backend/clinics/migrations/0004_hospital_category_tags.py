@@ -0,0 +1,40 @@
+import clinics.models
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinics', '0003_hospital_city_district'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        'ALTER TABLE hospitals ADD COLUMN IF NOT EXISTS category_tags text[] '
+                        'GENERATED ALWAYS AS (array_remove(regexp_split_to_array('
+                        'lower(btrim(regexp_replace("Рубрики", \'\\s+\', \' \', \'g\'))), \'\\s*[,;]\\s*\'), \'\')) STORED',
+                        'CREATE INDEX IF NOT EXISTS hospitals_category_tags_gin ON hospitals USING GIN (category_tags)',
+                    ],
+                    reverse_sql=[
+                        'DROP INDEX IF EXISTS hospitals_category_tags_gin',
+                        'ALTER TABLE hospitals DROP COLUMN IF EXISTS category_tags',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='hospital',
+                    name='category_tags',
+                    field=models.GeneratedField(
+                        db_persist=True,
+                        expression=clinics.models.CategoryTags('categories'),
+                        output_field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None),
+                    ),
+                ),
+            ],
+        ),
+    ]
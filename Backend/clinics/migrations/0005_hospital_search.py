@@ -0,0 +1,49 @@
+import clinics.models
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinics', '0004_hospital_category_tags'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        'ALTER TABLE hospitals ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ('
+                        'setweight(to_tsvector(\'russian\', coalesce("Наименование", \'\')), \'A\') || '
+                        'setweight(to_tsvector(\'simple\', coalesce("Наименование", \'\')), \'A\') || '
+                        'setweight(to_tsvector(\'russian\', coalesce("Рубрики", \'\')), \'B\') || '
+                        'setweight(to_tsvector(\'simple\', coalesce("Адрес", \'\')), \'C\') || '
+                        'setweight(to_tsvector(\'russian\', coalesce("Описание", \'\')), \'D\')'
+                        ') STORED',
+                        'CREATE INDEX IF NOT EXISTS hospitals_search_vector_gin ON hospitals USING GIN (search_vector)',
+                        # Опечатки и неполные слова: операторы % и %> по триграммам названия
+                        'CREATE INDEX IF NOT EXISTS hospitals_name_trgm ON hospitals USING GIN ("Наименование" gin_trgm_ops)',
+                    ],
+                    reverse_sql=[
+                        'DROP INDEX IF EXISTS hospitals_name_trgm',
+                        'DROP INDEX IF EXISTS hospitals_search_vector_gin',
+                        'ALTER TABLE hospitals DROP COLUMN IF EXISTS search_vector',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='hospital',
+                    name='search_vector',
+                    field=models.GeneratedField(
+                        db_persist=True,
+                        expression=clinics.models.HospitalSearchVector('name', 'categories', 'address', 'description'),
+                        output_field=django.contrib.postgres.search.SearchVectorField(),
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,4 +1,46 @@
-from django.db import models
+from django.contrib.gis.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import Func
+
+from geography.models import AddressCityDistrict
+
+
+class GeographyPoint(Func):
+    # ST_MakePoint(x, y) -> geography(Point, 4326); при пустых координатах NULL
+    template = "ST_SetSRID(ST_MakePoint(%(expressions)s), 4326)::geography"
+    output_field = models.PointField(geography=True, srid=4326)
+
+
+class CategoryTags(Func):
+    # «Рубрики» -> text[] тегов в нижнем регистре, как clinics.categories.parse_categories
+    template = (
+        r"array_remove(regexp_split_to_array("
+        r"lower(btrim(regexp_replace(%(expressions)s, '\s+', ' ', 'g'))), '\s*[,;]\s*'), '')"
+    )
+    output_field = ArrayField(models.TextField())
+
+
+class HospitalSearchVector(Func):
+    """Взвешенный tsvector по названию (A), рубрикам (B), адресу (C) и описанию (D).
+
+    Для казахского в PostgreSQL нет стеммера, поэтому название индексируется ещё
+    и конфигурацией simple — без стемминга, слово как есть.
+    """
+
+    arity = 4  # name, categories, address, description
+    PARTS = [(0, "russian", "A"), (0, "simple", "A"), (1, "russian", "B"), (2, "simple", "C"), (3, "russian", "D")]
+    output_field = SearchVectorField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        compiled = [compiler.compile(expression) for expression in self.get_source_expressions()]
+        sql = " || ".join(
+            f"setweight(to_tsvector('{config}', coalesce({compiled[i][0]}, '')), '{weight}')"
+            for i, config, weight in self.PARTS
+        )
+        params = [param for i, _, _ in self.PARTS for param in compiled[i][1]]
+        return sql, params
+
 
 class Hospital(models.Model):
     name = models.CharField(max_length=255, primary_key=True, db_column="Наименование")
@@ -20,6 +62,28 @@ class Hospital(models.Model):
     y = models.FloatField(blank=True, null=True, db_column="Y")
     x = models.FloatField(blank=True, null=True, db_column="X")
     gis_url = models.URLField(blank=True, null=True, db_column="2GIS URL")
+    location = models.GeneratedField(
+        expression=GeographyPoint("x", "y"),
+        output_field=models.PointField(geography=True, srid=4326),
+        db_persist=True,
+    )
+    # Рубрики, разобранные в массив тегов, под GIN-индексом: фильтр по рубрике без icontains
+    category_tags = models.GeneratedField(
+        expression=CategoryTags("categories"),
+        output_field=ArrayField(models.TextField()),
+        db_persist=True,
+    )
+    # Полнотекстовый поиск (clinics.search), под GIN-индексом
+    search_vector = models.GeneratedField(
+        expression=HospitalSearchVector("name", "categories", "address", "description"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    # Район по вхождению точки в полигон (manage.py assign_districts), в отличие от текстового district
+    city_district = models.ForeignKey(
+        AddressCityDistrict, blank=True, null=True, on_delete=models.DO_NOTHING,
+        db_constraint=False, related_name="hospitals",
+    )
 
     class Meta:
         db_table = "hospitals"
@@ -0,0 +1,84 @@
+import re
+from bisect import bisect_left
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+from rest_framework import filters
+
+_WORD = re.compile(r"\w+")
+
+
+def _normalize(text):
+    return " ".join(str(text).split()).lower().replace("ё", "е")
+
+
+def _words(text):
+    return _WORD.findall(_normalize(text))
+
+
+def search_hospitals(queryset, term):
+    """Полнотекстовый поиск по search_vector плюс триграммы по названию — для опечаток.
+
+    Оба условия идут по GIN-индексам; результат упорядочен по релевантности.
+    """
+    query = (
+        SearchQuery(term, config="russian", search_type="websearch")
+        | SearchQuery(term, config="simple", search_type="websearch")
+    )
+    return (
+        queryset
+        .filter(Q(search_vector=query) | Q(name__trigram_word_similar=term))
+        .annotate(rank=SearchRank(F("search_vector"), query) + TrigramWordSimilarity(term, "name"))
+        .order_by("-rank", "name")
+    )
+
+
+class HospitalSearchFilter(filters.SearchFilter):
+    """?search= через search_hospitals вместо ILIKE по нескольким колонкам."""
+
+    def filter_queryset(self, request, queryset, view):
+        term = " ".join(self.get_search_terms(request))
+        if not term:
+            return queryset
+        results = search_hospitals(queryset, term)
+        # Явная сортировка из ?ordering= важнее релевантности; если OrderingFilter
+        # её отбросил (неизвестное поле), остаётся сортировка по релевантности
+        ordering = queryset.query.order_by
+        if request.query_params.get(filters.OrderingFilter.ordering_param) and ordering:
+            results = results.order_by(*ordering)
+        return results
+
+
+class AutocompleteIndex:
+    """Подсказки по началу слов названия: отсортированный список слов и bisect, без БД.
+
+    Каждое слово запроса должно быть началом какого-то слова названия;
+    выше — названия, которые начинаются с запроса целиком, затем более короткие.
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self._normalized = [_normalize(name) for name in names]
+        pairs = sorted((word, i) for i, name in enumerate(names) for word in set(_words(name)))
+        self._words = [word for word, _ in pairs]
+        self._ids = [i for _, i in pairs]
+
+    def _prefixed(self, prefix):
+        start = bisect_left(self._words, prefix)
+        end = bisect_left(self._words, prefix + "\uffff")
+        return set(self._ids[start:end])
+
+    def complete(self, query, limit=10):
+        words = _words(query)
+        if not words:
+            return []
+        matches = None
+        for word in words:
+            found = self._prefixed(word)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+
+        query = _normalize(query)
+        ranked = sorted(matches, key=lambda i: (not self._normalized[i].startswith(query), len(self.names[i]), i))
+        return [self.names[i] for i in ranked[:limit]]
@@ -4,4 +4,5 @@ from .models import Hospital
 class HospitalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Hospital
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['location', 'category_tags', 'search_vector']
+        read_only_fields = ['city_district']
\ No newline at end of file
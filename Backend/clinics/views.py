@@ -1,9 +1,15 @@
-from rest_framework import viewsets, filters
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
+from analytics.snapshot import get_hospital_snapshot
+from geography.districts import assign_hospital_districts, resolve_district
+from .categories import filter_by_category
 from .models import Hospital
+from .search import HospitalSearchFilter
 from .serializers import HospitalSerializer
 
 
@@ -11,27 +17,78 @@ class HospitalViewSet(viewsets.ModelViewSet):
     queryset = Hospital.objects.all()
     serializer_class = HospitalSerializer
 
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, HospitalSearchFilter]
     filterset_fields = ['city']  # 'district' фильтруем вручную
     ordering_fields = ['name']
-    search_fields = ['name', 'categories', 'address', 'description']
 
     def get_queryset(self):
         queryset = super().get_queryset()
         district = self.request.query_params.get("district")
 
         if district:
-            district_cleaned = district.replace(" район", "").strip().lower()
-            queryset = queryset.filter(district__icontains=district_cleaned)
+            city_district = resolve_district(district)
+            if city_district is not None:
+                queryset = queryset.filter(city_district_id=city_district.id)
+            else:
+                # Район не найден среди полигонов — старый поиск по тексту
+                district_cleaned = district.replace(" район", "").strip().lower()
+                queryset = queryset.filter(district__icontains=district_cleaned)
+
+        category = self.request.query_params.get("category")
+        if category:
+            queryset = filter_by_category(queryset, category)
 
         return queryset
 
+    # В одной транзакции: сброс кэшей по сигналу срабатывает после привязки к району
+    @transaction.atomic
+    def perform_create(self, serializer):
+        hospital = serializer.save()
+        assign_hospital_districts([hospital.name])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        hospital = serializer.save()
+        assign_hospital_districts([hospital.name])
+
     @action(detail=False, methods=["get"], url_path="districts")
     def list_districts(self, request):
         districts = (
-            Hospital.objects.exclude(district__isnull=True)
-            .exclude(district="")
-            .values_list("district", flat=True)
+            Hospital.objects.filter(city_district__isnull=False)
+            .values_list("city_district__name_ru", flat=True)
             .distinct()
         )
         return Response(sorted(districts))
+
+    @action(detail=False, methods=["get"], url_path="autocomplete")
+    def autocomplete(self, request):
+        """Названия клиник по началу слов: ?q=стом&limit=10. Из памяти, без запроса к БД."""
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 20))
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        names = get_hospital_snapshot().autocomplete.complete(request.query_params.get("q", ""), limit)
+        response = Response(names)
+        patch_cache_control(response, public=True, max_age=60)
+        return response
+
+    @action(detail=False, methods=["get"], url_path="categories")
+    def list_categories(self, request):
+        """Рубрики с числом клиник, по убыванию; ?district= — только в этом районе."""
+        snapshot = get_hospital_snapshot()
+        mask = None
+        district = request.query_params.get("district")
+        if district:
+            city_district = resolve_district(district)
+            if city_district is None:
+                return Response([])
+            mask = snapshot.district_mask(city_district.id)
+
+        counts = snapshot.category_counts(mask)
+        result = [
+            {"category": name, "count": count}
+            for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            if count
+        ]
+        return Response(result)
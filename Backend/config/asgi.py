@@ -3,6 +3,13 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Async-вьюхи (чат-бот, маршруты) держат общий пул httpx только под ASGI:
+
+    uvicorn config.asgi:application --workers 4
+
+Под WSGI они работают, но каждый запрос открывает и закрывает свой пул.
+Потоковые выгрузки под ASGI отдаются асинхронным итератором (analytics/exports.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
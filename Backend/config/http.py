@@ -0,0 +1,75 @@
+"""Общий httpx.AsyncClient для исходящих запросов из async-вьюх.
+
+Клиент и его пул соединений привязаны к event loop, поэтому создаются один раз
+на loop (под ASGI — один на воркер). Семафор на каждый внешний сервис
+ограничивает число одновременных запросов к нему: лишние ждут слота, а не
+открывают новые соединения.
+
+Клиент закрывается вместе со своим loop: и asyncio.run (uvicorn), и
+async_to_sync (WSGI, runserver — новый loop на каждый запрос) перед закрытием
+loop отменяют незавершённые задачи, а задача-страж по отмене делает aclose().
+Под WSGI пул поэтому живёт один запрос — переиспользование соединений даёт
+только запуск через ASGI (config/asgi.py).
+"""
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+from django.conf import settings
+
+_states = weakref.WeakKeyDictionary()
+
+
+class _LoopState:
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+            ),
+            timeout=settings.UPSTREAM_TIMEOUT,
+        )
+        self.semaphores = {}
+        self.closer = asyncio.get_running_loop().create_task(self._close_with_loop())
+
+    async def _close_with_loop(self):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.client.aclose()
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState()
+    return state
+
+
+def get_async_client():
+    return _state().client
+
+
+def _semaphore(state, upstream):
+    semaphore = state.semaphores.get(upstream)
+    if semaphore is None:
+        semaphore = state.semaphores[upstream] = asyncio.Semaphore(settings.UPSTREAM_MAX_CONCURRENCY)
+    return semaphore
+
+
+async def request(upstream, method, url, **kwargs):
+    """Запрос через общий клиент; одновременно к upstream — не больше UPSTREAM_MAX_CONCURRENCY."""
+    state = _state()
+    async with _semaphore(state, upstream):
+        return await state.client.request(method, url, **kwargs)
+
+
+@asynccontextmanager
+async def stream(upstream, method, url, **kwargs):
+    """Потоковый ответ; слот upstream занят, пока поток не закрыт."""
+    state = _state()
+    async with _semaphore(state, upstream):
+        async with state.client.stream(method, url, **kwargs) as response:
+            yield response
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,7 +26,7 @@ SECRET_KEY = config('SECRET_KEY')
 # OPENAI_API_KEY = config('OPENAI_API_KEY')
 
 # OPENROUTER_API_KEY = config('OPENROUTER_API_KEY')
-GROQ_API_KEY = config('GROQ_API_KEY')
+GROQ_API_KEY = config('GROQ_API_KEY', default='')
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=True, cast=bool)
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     'django.contrib.gis',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'corsheaders',
@@ -122,8 +123,90 @@ CACHES = {
     }
 }
 
-# CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'  # база 0 под Celery
-# CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://127.0.0.1:6379/0')  # база 0 под Celery
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://127.0.0.1:6379/0')
+
+# Предрасчёт аналитики: прогрев идёт чаще, чем истекают ключи, поэтому они не остывают;
+# при изменении клиник и ячеек зависимые ключи сбрасываются сразу (analytics/invalidation.py)
+ANALYTICS_REFRESH_INTERVAL = config('ANALYTICS_REFRESH_INTERVAL', default=60 * 10, cast=int)
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+CELERY_BEAT_SCHEDULE = {
+    'refresh-high-demand-zones': {
+        'task': 'analytics.tasks.refresh_high_demand_zones_task',
+        'schedule': ANALYTICS_REFRESH_INTERVAL,
+    },
+    'warm-analytics-cache': {
+        'task': 'analytics.tasks.warm_analytics_cache_task',
+        'schedule': ANALYTICS_REFRESH_INTERVAL,
+    },
+    'cleanup-export-files': {
+        'task': 'analytics.tasks.cleanup_export_files_task',
+        'schedule': 60 * 60,
+    },
+}
+
+# Аналитика
+# Жителей на одну клинику: выше OVERLOAD — район перегружен, выше CRITICAL — критично
+DISTRICT_OVERLOAD_THRESHOLD = config('DISTRICT_OVERLOAD_THRESHOLD', default=15000, cast=int)
+DISTRICT_CRITICAL_THRESHOLD = config('DISTRICT_CRITICAL_THRESHOLD', default=20000, cast=int)
+NEAREST_HOSPITALS_DEFAULT_K = config('NEAREST_HOSPITALS_DEFAULT_K', default=5, cast=int)
+NEAREST_HOSPITALS_MAX_K = config('NEAREST_HOSPITALS_MAX_K', default=50, cast=int)
+# Шаг сетки (в градусах), на который округляются координаты в ключах кэша
+NEAREST_CACHE_PRECISION_DEG = config('NEAREST_CACHE_PRECISION_DEG', default=0.005, cast=float)
+NEAREST_CACHE_TIMEOUT = config('NEAREST_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+# Кэшируются только выдачи, все кандидаты которых ближе этого (км): их сбрасывают изменения клиник поблизости
+NEAREST_CACHE_REACH_KM = config('NEAREST_CACHE_REACH_KM', default=10.0, cast=float)
+ROUTE_CACHE_PRECISION_DEG = config('ROUTE_CACHE_PRECISION_DEG', default=0.001, cast=float)
+ROUTE_CACHE_TIMEOUT = config('ROUTE_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+ROUTE_CACHE_LOCAL_SIZE = config('ROUTE_CACHE_LOCAL_SIZE', default=1024, cast=int)  # LRU в памяти воркера
+
+# Векторные тайлы: время жизни в Redis и в кэше браузера/CDN (секунды)
+TILE_CACHE_TIMEOUT = config('TILE_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+TILE_CACHE_MAX_AGE = config('TILE_CACHE_MAX_AGE', default=60 * 60, cast=int)
+GEOMETRY_CACHE_TIMEOUT = config('GEOMETRY_CACHE_TIMEOUT', default=60 * 60, cast=int)  # GeoJSON-выдачи по зумам
+
+# Файл снимка сетки и клиник (manage.py build_snapshot), открывается воркерами через mmap;
+# пусто — каждый процесс строит снимок из БД сам
+SNAPSHOT_PATH = config('SNAPSHOT_PATH', default='')
+SNAPSHOT_BUILD_TIMEOUT = config('SNAPSHOT_BUILD_TIMEOUT', default=60 * 30, cast=int)  # сек, после них зависшая сборка не держит очередь
+
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)  # строк за один fetch при выгрузке
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'exports'))  # файлы фоновых выгрузок
+# Сколько секунд хранить файлы выгрузок, заменённых более новыми (cleanup_export_files_task)
+EXPORT_RETENTION = config('EXPORT_RETENTION', default=60 * 60 * 24, cast=int)
+# Сколько секунд ждать незавершённую выгрузку, прежде чем считать её упавшей и поставить заново
+EXPORT_JOB_TIMEOUT = config('EXPORT_JOB_TIMEOUT', default=60 * 60, cast=int)
+
+# Исходящие запросы из async-вьюх (config/http.py): пул httpx на воркер и
+# не больше UPSTREAM_MAX_CONCURRENCY запросов одновременно к одному сервису
+UPSTREAM_MAX_CONNECTIONS = config('UPSTREAM_MAX_CONNECTIONS', default=200, cast=int)
+UPSTREAM_MAX_KEEPALIVE = config('UPSTREAM_MAX_KEEPALIVE', default=50, cast=int)
+UPSTREAM_MAX_CONCURRENCY = config('UPSTREAM_MAX_CONCURRENCY', default=200, cast=int)
+UPSTREAM_TIMEOUT = config('UPSTREAM_TIMEOUT', default=10.0, cast=float)
+CHATBOT_TIMEOUT = config('CHATBOT_TIMEOUT', default=15.0, cast=float)
+
+# Чат-бот: groq — Groq API, local — заглушка без сети (разработка и тесты)
+CHATBOT_BACKEND = config('CHATBOT_BACKEND', default='groq')
+CHATBOT_MODEL = config('CHATBOT_MODEL', default='llama3-8b-8192')
+CHATBOT_CACHE_SIZE = config('CHATBOT_CACHE_SIZE', default=1000, cast=int)  # ответов на процесс
+CHATBOT_CACHE_TIMEOUT = config('CHATBOT_CACHE_TIMEOUT', default=60 * 60 * 6, cast=int)
+# Насколько похожим (Jaccard по триграммам символов) должен быть вопрос, чтобы взять готовый ответ
+CHATBOT_CACHE_SIMILARITY = config('CHATBOT_CACHE_SIMILARITY', default=0.8, cast=float)
+CHATBOT_CONTEXT_CLINICS = config('CHATBOT_CONTEXT_CLINICS', default=5, cast=int)  # клиник в промпте
+# Потоковые ответы (SSE): одновременных потоков с одного IP; TTL счётчика — на случай оборванного воркера
+# Адреса своих обратных прокси (nginx): за ними клиент берётся из X-Forwarded-For
+TRUSTED_PROXIES = config('TRUSTED_PROXIES', default='127.0.0.1,::1', cast=Csv())
+CHATBOT_STREAMS_PER_CLIENT = config('CHATBOT_STREAMS_PER_CLIENT', default=2, cast=int)
+CHATBOT_STREAM_SLOT_TIMEOUT = config('CHATBOT_STREAM_SLOT_TIMEOUT', default=120, cast=int)
+
+# Маршрутизация (OSRM-совместимый API)
+ROUTING_BASE_URL = config('ROUTING_BASE_URL', default='http://router.project-osrm.org')
+ROUTING_PROFILE = config('ROUTING_PROFILE', default='driving')
+ROUTING_CONNECT_TIMEOUT = config('ROUTING_CONNECT_TIMEOUT', default=2.0, cast=float)
+ROUTING_READ_TIMEOUT = config('ROUTING_READ_TIMEOUT', default=5.0, cast=float)
+ROUTING_POOL_SIZE = config('ROUTING_POOL_SIZE', default=10, cast=int)
+ROUTING_BREAKER_THRESHOLD = config('ROUTING_BREAKER_THRESHOLD', default=5, cast=int)
+ROUTING_BREAKER_RESET = config('ROUTING_BREAKER_RESET', default=30, cast=int)  # секунд
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -19,7 +19,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from clinics.views import HospitalViewSet
-from geography.views import AddressCityDistrictViewSet, EDCHexa500x500ViewSet
+from geography.views import AddressCityDistrictViewSet, EDCHexa500x500ViewSet, vector_tile
 from population.views import GridsPopulationViewSet
 
 router = DefaultRouter()
@@ -31,6 +31,7 @@ router.register(r'edc-hexa-500x500', EDCHexa500x500ViewSet)
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('api/tiles/<str:layer>/<int:z>/<int:x>/<int:y>.mvt', vector_tile, name='vector-tile'),
     path('api/analytics/', include('analytics.urls')),
     path('api/chatbot/', include('chatbot.urls')),
 ]
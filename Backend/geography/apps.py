@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GeographyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'geography'
+
+    def ready(self):
+        from .signals import connect
+        connect()
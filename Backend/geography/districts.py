@@ -0,0 +1,106 @@
+from django.db import connection
+
+from clinics.models import Hospital
+from population.models import GridsPopulation
+from .models import AddressCityDistrict
+
+# Точки дальше этого (в градусах, ~1 км) от всех районов остаются без района
+SNAP_DISTANCE_DEG = 0.01
+
+
+def normalize_district_name(name):
+    # "Алмалинский район", "алмалинский", " Алмалинский  р-н" -> "алмалинский"
+    words = str(name).casefold().replace("р-н", " ").split()
+    return " ".join(w for w in words if w != "район")
+
+
+def resolve_district(name):
+    """Район по названию из фильтра (ru/kz, с «район» или без); None, если не найден."""
+    if not name:
+        return None
+    target = normalize_district_name(name)
+    for district in AddressCityDistrict.objects.only("id", "name_ru", "name_kz", "response_name_ru", "response_name_kz"):
+        names = (district.name_ru, district.name_kz, district.response_name_ru, district.response_name_kz)
+        if any(n and normalize_district_name(n) == target for n in names):
+            return district
+    return None
+
+
+def filter_by_district(queryset, name, fallback_lookup):
+    """Точный фильтр по city_district; если район не распознан — по тексту через fallback_lookup."""
+    district = resolve_district(name)
+    if district is not None:
+        return queryset.filter(city_district_id=district.id)
+    return queryset.filter(**{fallback_lookup: name})
+
+
+def _assign(table, pk_column, point_sql, snap_distance, pks=None):
+    # Сначала район, содержащий точку, иначе ближайший в пределах snap_distance;
+    # ST_DWithin и <-> идут по GiST-индексу address_city_districts.geometry
+    where = ""
+    params = [snap_distance]
+    if pks is not None:
+        where = f"WHERE t.{pk_column} = ANY(%s)"
+        params.append(list(pks))
+
+    sql = f"""
+        UPDATE {table} AS target
+        SET city_district_id = sub.district_id
+        FROM (
+            SELECT t.{pk_column} AS pk, (
+                SELECT d.id
+                FROM address_city_districts AS d
+                WHERE ST_DWithin(d.geometry, {point_sql}, %s)
+                ORDER BY ST_Contains(d.geometry, {point_sql}) DESC, d.geometry <-> {point_sql}
+                LIMIT 1
+            ) AS district_id
+            FROM {table} AS t
+            {where}
+        ) AS sub
+        WHERE target.{pk_column} = sub.pk
+          AND target.city_district_id IS DISTINCT FROM sub.district_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def district_at(geometry, snap_distance=SNAP_DISTANCE_DEG):
+    """id района для геометрии ячейки — по тем же правилам, что assign_grid_districts."""
+    if geometry is None:
+        return None
+    srid = geometry.srid or GridsPopulation._meta.get_field("geometry").srid
+    sql = """
+        WITH p AS (SELECT ST_PointOnSurface(ST_SetSRID(ST_GeomFromWKB(%s), %s)) AS point)
+        SELECT d.id
+        FROM address_city_districts AS d, p
+        WHERE ST_DWithin(d.geometry, p.point, %s)
+        ORDER BY ST_Contains(d.geometry, p.point) DESC, d.geometry <-> p.point
+        LIMIT 1
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [bytes(geometry.wkb), srid, snap_distance])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def assign_hospital_districts(names=None, snap_distance=SNAP_DISTANCE_DEG):
+    qn = connection.ops.quote_name
+    return _assign(
+        qn(Hospital._meta.db_table),
+        qn(Hospital._meta.pk.column),
+        "t.location::geometry",
+        snap_distance,
+        names,
+    )
+
+
+def assign_grid_districts(ids=None, snap_distance=SNAP_DISTANCE_DEG):
+    qn = connection.ops.quote_name
+    return _assign(
+        qn(GridsPopulation._meta.db_table),
+        qn(GridsPopulation._meta.pk.column),
+        "ST_PointOnSurface(t.geometry)",
+        snap_distance,
+        ids,
+    )
@@ -0,0 +1,6 @@
+from rest_framework_gis.filters import InBBoxFilter
+
+
+class BBoxFilter(InBBoxFilter):
+    # ?bbox=minx,miny,maxx,maxy; && по GiST-индексу поля view.bbox_filter_field
+    bbox_param = "bbox"
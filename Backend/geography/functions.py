@@ -0,0 +1,6 @@
+from django.contrib.gis.db.models.functions import GeoFunc
+
+
+class SimplifyPreserveTopology(GeoFunc):
+    function = "ST_SimplifyPreserveTopology"
+    geom_param_pos = (0,)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from analytics.invalidation import grids_changed, hospitals_changed
+from geography.districts import SNAP_DISTANCE_DEG, assign_grid_districts, assign_hospital_districts
+
+
+class Command(BaseCommand):
+    help = "Привязывает клиники и ячейки сетки к районам по полигонам address_city_districts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--snap-distance", type=float, default=SNAP_DISTANCE_DEG,
+            help="Насколько далеко (в градусах) от района ещё можно привязать точку к ближайшему",
+        )
+
+    def handle(self, *args, **options):
+        hospitals = assign_hospital_districts(snap_distance=options["snap_distance"])
+        grids = assign_grid_districts(snap_distance=options["snap_distance"])
+        # UPDATE идёт сырым SQL, мимо сигналов
+        if hospitals:
+            hospitals_changed()
+        if grids:
+            grids_changed()
+        self.stdout.write(self.style.SUCCESS(f"Обновлено клиник: {hospitals}, ячеек сетки: {grids}"))
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def assign_districts(apps, schema_editor):
+    # Колонки city_district добавлены пустыми — заполнить их по полигонам районов
+    from geography.districts import SNAP_DISTANCE_DEG, _assign
+
+    qn = schema_editor.connection.ops.quote_name
+    Hospital = apps.get_model('clinics', 'Hospital')
+    GridsPopulation = apps.get_model('population', 'GridsPopulation')
+    _assign(qn(Hospital._meta.db_table), qn(Hospital._meta.pk.column), 't.location::geometry', SNAP_DISTANCE_DEG)
+    _assign(
+        qn(GridsPopulation._meta.db_table),
+        qn(GridsPopulation._meta.pk.column),
+        'ST_PointOnSurface(t.geometry)',
+        SNAP_DISTANCE_DEG,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinics', '0003_hospital_city_district'),
+        ('geography', '0001_initial'),
+        ('population', '0002_gridspopulation_city_district'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_districts, migrations.RunPython.noop),
+    ]
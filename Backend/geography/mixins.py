@@ -0,0 +1,92 @@
+import hashlib
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .functions import SimplifyPreserveTopology
+from .tiles import MAX_ZOOM, layer_version
+
+
+def zoom_tolerance(zoom):
+    # Половина экранного пикселя (тайл 256 px) в градусах
+    return 360 / (256 * 2 ** zoom) / 2
+
+
+def zoom_precision(zoom):
+    # Знаков после запятой достаточно, чтобы ошибка округления была меньше пикселя
+    return min(15, max(0, math.ceil(-math.log10(360 / (256 * 2 ** zoom)))))
+
+
+class GeometryDetailMixin:
+    """Параметры выдачи геометрии для вьюсетов с SparseGeoFeatureSerializer.
+
+    ?zoom=12 — упростить геометрию и округлить координаты под этот зум,
+    ?simplify=0.001 — явный допуск упрощения (в градусах),
+    ?precision=5 — знаков после запятой, ?fields=id,name_ru — какие свойства отдавать.
+    Ответы list кэшируются по параметрам запроса и версии слоя.
+    """
+
+    layer_name = None
+    geo_field = None
+
+    def geometry_options(self):
+        if hasattr(self, "_geometry_options"):
+            return self._geometry_options
+
+        params = self.request.query_params
+        try:
+            zoom = int(params["zoom"]) if params.get("zoom") else None
+            tolerance = float(params["simplify"]) if params.get("simplify") else None
+            precision = int(params["precision"]) if params.get("precision") else None
+        except ValueError:
+            raise ValidationError("zoom, simplify and precision must be numbers")
+
+        if zoom is not None:
+            if not 0 <= zoom <= MAX_ZOOM:
+                raise ValidationError(f"zoom must be between 0 and {MAX_ZOOM}")
+            tolerance = tolerance if tolerance is not None else zoom_tolerance(zoom)
+            precision = precision if precision is not None else zoom_precision(zoom)
+        if tolerance is not None and tolerance <= 0:
+            raise ValidationError("simplify must be positive")
+        if precision is not None and not 0 <= precision <= 15:
+            raise ValidationError("precision must be between 0 and 15")
+
+        fields = None
+        if params.get("fields"):
+            fields = [name.strip() for name in params["fields"].split(",") if name.strip()]
+
+        self._geometry_options = tolerance, precision, fields
+        return self._geometry_options
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tolerance, _, fields = self.geometry_options()
+
+        if fields is not None:
+            model_fields = {f.name for f in queryset.model._meta.concrete_fields}
+            queryset = queryset.only(*(set(fields) & model_fields), queryset.model._meta.pk.name, self.geo_field)
+        if tolerance is not None:
+            queryset = queryset.annotate(
+                simplified_geometry=SimplifyPreserveTopology(self.geo_field, tolerance)
+            )
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        _, precision, fields = self.geometry_options()
+        kwargs.setdefault("fields", fields)
+        kwargs.setdefault("precision", precision)
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        query = "&".join(f"{k}={','.join(v)}" for k, v in sorted(request.query_params.lists()))
+        digest = hashlib.md5(query.encode("utf-8")).hexdigest()
+        key = f"geo:{self.layer_name}:{layer_version(self.layer_name)}:{digest}"
+
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, settings.GEOMETRY_CACHE_TIMEOUT)
+        return Response(data)
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """Keyset-пагинация по id, включается параметром ?page_size=.
+
+    Без него выдача остаётся прежним списком, чтобы не ломать старых клиентов.
+    """
+
+    ordering = "id"
+    page_size = None
+    page_size_query_param = "page_size"
+    max_page_size = 5000
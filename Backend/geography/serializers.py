@@ -1,17 +1,44 @@
 from rest_framework import serializers
+from rest_framework_gis.fields import GeometryField
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from .models import AddressCityDistrict, EDCHexa500x500
 
 
-class AddressCityDistrictSerializer(GeoFeatureModelSerializer):
+class SparseGeoFeatureSerializer(GeoFeatureModelSerializer):
+    """GeoJSON-сериализатор с выбором полей, точностью координат и упрощённой геометрией.
+
+    fields — какие свойства оставить (геометрия и id остаются всегда),
+    precision — число знаков после запятой в координатах.
+    Если у объекта есть simplified_geometry (см. GeometryDetailMixin), отдаётся она.
+    """
+
+    def __init__(self, *args, fields=None, precision=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        geo_field = self.Meta.geo_field
+        if fields is not None:
+            keep = set(fields) | {geo_field, "id"}
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+        if precision is not None:
+            self.fields[geo_field] = GeometryField(precision=precision)
+
+    def to_representation(self, instance):
+        simplified = getattr(instance, "simplified_geometry", None)
+        if simplified is not None:
+            setattr(instance, self.Meta.geo_field, simplified)
+        return super().to_representation(instance)
+
+
+class AddressCityDistrictSerializer(SparseGeoFeatureSerializer):
     class Meta:
         model = AddressCityDistrict
         geo_field = "geometry"
         fields = '__all__'
 
 
-class EDCHexa500x500Serializer(GeoFeatureModelSerializer):
+class EDCHexa500x500Serializer(SparseGeoFeatureSerializer):
     class Meta:
         model = EDCHexa500x500
         geo_field = "geom"
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
@@ -0,0 +1,33 @@
+"""Сброс кэша тайлов и GeoJSON-выдач слоя при изменении его таблицы и привязка ячеек к районам.
+
+Сигналы ловят save/delete через ORM; массовые загрузки должны сами вызвать
+invalidate_tiles (для ячеек это делает analytics.invalidation.grids_changed)
+и assign_grid_districts.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from population.models import GridsPopulation
+from .districts import district_at
+from .tiles import TILE_LAYERS, invalidate_tiles
+
+
+def _receiver(layer_name):
+    def layer_changed(sender, **kwargs):
+        transaction.on_commit(lambda: invalidate_tiles(layer_name))
+    return layer_changed
+
+
+def _assign_grid_district(sender, instance, update_fields=None, **kwargs):
+    # Район ячейки — по её геометрии; save(update_fields=...) без city_district его не пишет
+    if update_fields is not None and "city_district" not in update_fields:
+        return
+    instance.city_district_id = district_at(instance.geometry)
+
+
+def connect():
+    pre_save.connect(_assign_grid_district, sender=GridsPopulation, dispatch_uid="districts:grids")
+    for layer_name, layer in TILE_LAYERS.items():
+        receiver = _receiver(layer_name)
+        post_save.connect(receiver, sender=layer.model, weak=False, dispatch_uid=f"tiles:{layer_name}:save")
+        post_delete.connect(receiver, sender=layer.model, weak=False, dispatch_uid=f"tiles:{layer_name}:delete")
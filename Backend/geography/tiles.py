@@ -0,0 +1,122 @@
+import hashlib
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import connection
+
+from population.models import GridsPopulation
+from .models import AddressCityDistrict, EDCHexa500x500
+
+WEB_MERCATOR_WIDTH_M = 40075016.68
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MAX_ZOOM = 22
+
+
+@dataclass
+class TileLayer:
+    model: type
+    geom_field: str
+    attributes: list
+    # Дополнительные атрибуты, которые отдаются только начиная с detail_zoom
+    detail_attributes: list = field(default_factory=list)
+    detail_zoom: int = 14
+    where: str = ""
+    # Начиная с этого зума геометрия не упрощается
+    full_resolution_zoom: int = 15
+
+    def columns(self, z):
+        names = self.attributes + (self.detail_attributes if z >= self.detail_zoom else [])
+        return [self.model._meta.get_field(name).column for name in names]
+
+
+TILE_LAYERS = {
+    "grids-population": TileLayer(
+        model=GridsPopulation,
+        geom_field="geometry",
+        attributes=["id", "total_sum_population"],
+        detail_attributes=["name_region", "f0_14", "f15_25", "f26_35", "f36_45", "f46_55", "f56_65", "f66"],
+        where="t.is_deleted = false",
+    ),
+    "hexagons": TileLayer(
+        model=EDCHexa500x500,
+        geom_field="geom",
+        attributes=["id"],
+    ),
+    "districts": TileLayer(
+        model=AddressCityDistrict,
+        geom_field="geometry",
+        attributes=["id", "name_ru", "name_kz"],
+        detail_zoom=0,
+    ),
+}
+
+
+def simplify_tolerance(z):
+    # Половина экранного пикселя (тайл 256 px) в метрах EPSG:3857
+    return WEB_MERCATOR_WIDTH_M / (256 * 2 ** z) / 2
+
+
+def render_tile(layer_name, z, x, y):
+    layer = TILE_LAYERS[layer_name]
+    qn = connection.ops.quote_name
+    geom = qn(layer.model._meta.get_field(layer.geom_field).column)
+    columns = ", ".join(f"t.{qn(column)}" for column in layer.columns(z))
+    where = f"AND {layer.where}" if layer.where else ""
+
+    projected = f"ST_Transform(t.{geom}, 3857)"
+    if z < layer.full_resolution_zoom:
+        projected = f"ST_SimplifyPreserveTopology({projected}, %(tolerance)s)"
+
+    sql = f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom({projected}, bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                   {columns}
+            FROM {qn(layer.model._meta.db_table)} AS t, bounds
+            WHERE t.{geom} && ST_Transform(bounds.geom, 4326) {where}
+        )
+        SELECT ST_AsMVT(mvtgeom.*, %(layer)s, {TILE_EXTENT}, 'geom')
+        FROM mvtgeom
+        WHERE mvtgeom.geom IS NOT NULL
+    """
+    params = {"z": z, "x": x, "y": y, "tolerance": simplify_tolerance(z), "layer": layer_name}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+
+def _version_key(layer_name):
+    return f"tiles:version:{layer_name}"
+
+
+def layer_version(layer_name):
+    """Версия данных слоя; входит в ключи всех кэшей, построенных по этому слою."""
+    return cache.get_or_set(_version_key(layer_name), 1, None)
+
+
+def invalidate_tiles(layer_name):
+    """Сбрасывает все закэшированные тайлы и выдачи слоя (меняется версия в ключе)."""
+    key = _version_key(layer_name)
+    cache.add(key, 1, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def get_tile(layer_name, z, x, y, timeout):
+    """(etag, bytes) тайла из кэша или из PostGIS."""
+    version = layer_version(layer_name)
+    key = f"tiles:{layer_name}:{version}:{z}/{x}/{y}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    data = render_tile(layer_name, z, x, y)
+    etag = hashlib.md5(data).hexdigest()
+    cache.set(key, (etag, data), timeout)
+    return etag, data
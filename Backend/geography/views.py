@@ -1,11 +1,44 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets
+from .filters import BBoxFilter
+from .mixins import GeometryDetailMixin
+from .pagination import OptionalCursorPagination
 from .models import AddressCityDistrict, EDCHexa500x500
 from .serializers import AddressCityDistrictSerializer, EDCHexa500x500Serializer
+from .tiles import MAX_ZOOM, TILE_LAYERS, get_tile
 
-class AddressCityDistrictViewSet(viewsets.ReadOnlyModelViewSet):
+class AddressCityDistrictViewSet(GeometryDetailMixin, viewsets.ReadOnlyModelViewSet):
     queryset = AddressCityDistrict.objects.all()
     serializer_class = AddressCityDistrictSerializer
+    layer_name = "districts"
+    geo_field = "geometry"
 
-class EDCHexa500x500ViewSet(viewsets.ReadOnlyModelViewSet):
+class EDCHexa500x500ViewSet(GeometryDetailMixin, viewsets.ReadOnlyModelViewSet):
     queryset = EDCHexa500x500.objects.all()
-    serializer_class = EDCHexa500x500Serializer
\ No newline at end of file
+    serializer_class = EDCHexa500x500Serializer
+    layer_name = "hexagons"
+    geo_field = "geom"
+    filter_backends = [BBoxFilter]
+    bbox_filter_field = "geom"
+    bbox_filter_include_overlapping = True
+    pagination_class = OptionalCursorPagination
+
+
+@require_GET
+def vector_tile(request, layer, z, x, y):
+    if layer not in TILE_LAYERS or z > MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise Http404("Unknown layer or tile")
+
+    etag, data = get_tile(layer, z, x, y, settings.TILE_CACHE_TIMEOUT)
+    quoted_etag = f'"{etag}"'
+
+    # If-None-Match — список ETag (или *), сравнение по RFC 9110
+    response = get_conditional_response(request, etag=quoted_etag)
+    if response is None:
+        response = HttpResponse(data, content_type="application/vnd.mapbox-vector-tile")
+    response["ETag"] = quoted_etag
+    response["Cache-Control"] = f"public, max-age={settings.TILE_CACHE_MAX_AGE}"
+    return response
@@ -0,0 +1,18 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geography', '0001_initial'),
+        ('population', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gridspopulation',
+            name='city_district',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='grids', to='geography.addresscitydistrict'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.gis.db import models
 
+from geography.models import AddressCityDistrict
+
 class GridsPopulation(models.Model):
     id = models.BigAutoField(primary_key=True)
     name_region = models.CharField(max_length=255)
@@ -20,6 +22,10 @@ class GridsPopulation(models.Model):
     is_deleted = models.BooleanField()
     geometry = models.GeometryField()
     name_region_kz = models.CharField(max_length=255)
+    # Район по вхождению ячейки в полигон (manage.py assign_districts)
+    city_district = models.ForeignKey(
+        AddressCityDistrict, blank=True, null=True, on_delete=models.SET_NULL, related_name="grids",
+    )
 
     class Meta:
         db_table = "grids_population"
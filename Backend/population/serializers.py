@@ -3,6 +3,14 @@ from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from .models import GridsPopulation
 
 class PopulationGridSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ?fields=id,total_sum_population — отдаём только запрошенные поля
+        if fields is not None:
+            for name in list(self.fields):
+                if name not in fields:
+                    self.fields.pop(name)
+
     class Meta:
         model = GridsPopulation
         fields = '__all__'
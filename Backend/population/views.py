@@ -2,12 +2,37 @@ from django.db.models import Sum
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from geography.filters import BBoxFilter
+from geography.pagination import OptionalCursorPagination
 from .models import GridsPopulation
 from .serializers import PopulationGridSerializer
 
 class GridsPopulationViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = GridsPopulation.objects.all()
     serializer_class = PopulationGridSerializer
+    filter_backends = [BBoxFilter]
+    bbox_filter_field = "geometry"
+    bbox_filter_include_overlapping = True
+    pagination_class = OptionalCursorPagination
+
+    def requested_fields(self):
+        fields = self.request.query_params.get("fields")
+        if not fields:
+            return None
+        return [name.strip() for name in fields.split(",") if name.strip()]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.requested_fields()
+        if fields is not None:
+            # Не тянем из БД то, что не попадёт в ответ (в первую очередь геометрию)
+            model_fields = {f.name for f in GridsPopulation._meta.concrete_fields}
+            queryset = queryset.only(*(set(fields) & model_fields), "id")
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
 
     @action(detail=False, methods=['get'], url_path='population-by-region')
     def population_by_region(self, request):